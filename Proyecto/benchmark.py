@@ -0,0 +1,462 @@
+"""
+Este archivo implementa un conjunto de benchmarks para las partes más costosas
+del proyecto: la simulación de los mundos, las redes neuronales, el algoritmo
+genético y el entrenamiento concurrente.
+
+Uso
+---
+    python benchmark.py                        # Todos los benchmarks
+    python benchmark.py --quick                # Barridos pequeños
+    python benchmark.py --only world net       # Sólo algunos grupos
+    python benchmark.py --output base.jsonl    # Guarda los resultados
+    python benchmark.py --compare base.jsonl nuevo.jsonl
+
+Cada resultado es un diccionario en una línea de JSON, con el nombre del
+benchmark, sus parámetros, los tiempos medidos y la versión del código, de
+modo que los archivos de dos commits distintos se pueden comparar.
+"""
+
+import argparse
+import json
+import os
+import pickle
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+import neural_network as nn
+import bird as fb
+import genetic_algorithm as ga
+import bird_utils as fbu
+
+            # Parámetros físicos
+SETTINGS = {'GRAVITY': -1,        # Aceleración de la gravedad
+            'VX': -1,             # Velocidad horizontal del pájaro
+            'DT': 0.1,            # Unidad de tiempo
+            'MIN_VELOCITY': -1.2, # Velocidad vertical mínima del pájaro
+
+            # Parámetros del mundo
+            'TOP': 8,            # Altura del mundo
+            'RIGHT': 10,         # Ancho del mundo
+            'PIPE_GAP': 2.5,     # Tamaño del espacio entre tuberías
+            'MINIMUM_HEIGHT': 2, # Mínima separación entre la tubería y el piso/techo
+            'PIPE_WIDTH': 1,     # Ancho de las tuberías
+            'BIRD_RADIUS': 0.3,  # Radio del pájaro
+            'FLAP_SPEED': 1.3,   # Velocidad que adquiere el pájaro cuando aletea
+            'MAX_STEPS': 5000,   # Máximo número de unidades de tiempo que pueden estar vivos los pájaros
+
+            # Recompensas y penalizaciones
+            'DEATH_PENALTY': 0,   # Penalización por morir
+            'ALIVE_REWARD': 0.05, # Recompensa por estar vivo una unidad de tiempo
+            'PIPE_REWARD': 1,     # Recompensa por pasar una tubería
+
+            # Parámetros genéticos
+            'MUTATION': 0.03,          # Porcentaje del genoma total de los hijos a mutar
+            'CROSSOVER': 0.8,          # Porcentaje de la población nueva que será producto de crossover
+            'ELITISM': 0.1,            # Porcentaje de la población que serán copias exactas de las mejores entidades
+            'SELECTION': 'tournament', # Método de selección
+            'CONTESTANTS': 8,          # Número de participantes en el torneo
+
+            # Parámetros de la red de los pájaros
+            'LAYER_SIZES': [2,6,1],
+            'ACTIVATION_FUNCTIONS': ['sigmoid']*2,
+            'LAST_ACTIVATION': 'binary'
+}
+
+def settings_with(**changes):
+    """
+    Regresa una copia de `SETTINGS` con algunos parámetros cambiados.
+    """
+    settings = dict(SETTINGS)
+    settings.update(changes)
+    return settings
+
+def random_nets(n, settings):
+    """
+    Genera `n` redes aleatorias compatibles con la configuración dada.
+    """
+    return [nn.NeuralNet(settings['LAYER_SIZES'], settings['ACTIVATION_FUNCTIONS'],
+                         settings['LAST_ACTIVATION'], flat=settings.get('FLAT_GENOME', False),
+                         dtype=settings.get('DTYPE', float))
+            for _ in range(n)]
+
+def layer_sizes(hidden):
+    """
+    Topología de la red con una capa oculta de tamaño `hidden`.
+    """
+    return [2, hidden, 1]
+
+def measure(fn, repeat=5, number=1, setup=None):
+    """
+    Mide el tiempo de ejecución de una función.
+
+    Parámetros
+    ----------
+    fn : callable
+        Función a medir. Recibe lo que regrese `setup`, o nada si `setup` es `None`.
+
+    repeat : int = 5
+        Número de mediciones.
+
+    number : int = 1
+        Número de llamadas a `fn` por medición.
+
+    setup : callable = None
+        Función que prepara los argumentos de `fn`. Se llama antes de cada
+        medición y no se incluye en el tiempo.
+
+    Salida
+    ------
+    times : list
+        Lista con el tiempo promedio por llamada, en segundos, de cada medición.
+    """
+    times = []
+    for _ in range(repeat):
+        args = () if setup is None else (setup(),)
+        start = time.perf_counter()
+        for _ in range(number):
+            fn(*args)
+        times.append((time.perf_counter() - start)/number)
+    return times
+
+def record(name, params, times, **extra):
+    """
+    Construye el registro de un benchmark.
+    """
+    out = {'benchmark': name,
+           'params': params,
+           'best': min(times),
+           'mean': float(np.mean(times)),
+           'std': float(np.std(times)),
+           'repeat': len(times)}
+    out.update(extra)
+    return out
+
+def bench_world(quick):
+    """
+    Mide `World.step` y `World.play`, con y sin la versión vectorizada, y `World.play` con el kernel de
+    Numba (o su reemplazo con numpy, si Numba no está instalado).
+    """
+    sizes = [10, 100] if quick else [10, 100, 1000, 5000]
+    for vectorized in [False, True]:
+        for n in sizes:
+            settings = settings_with(VECTORIZED=vectorized)
+            nets = random_nets(n, settings)
+
+            def setup():
+                return fbu.make_world(nets, settings, seed=0)
+            def steps(world):
+                for _ in range(50):
+                    world.step()
+            times = measure(steps, repeat=3, setup=setup)
+            yield record('world_step', {'birds': n, 'vectorized': vectorized}, [t/50 for t in times])
+
+            play = measure(lambda world: world.play(), repeat=3, setup=setup)
+            yield record('world_play', {'birds': n, 'vectorized': vectorized}, play)
+    for n in sizes:
+        settings = settings_with(BACKEND='numba')
+        nets = random_nets(n, settings)
+        fbu.make_world(nets, settings, seed=0).play(max_steps=1) # Compila el kernel
+        play = measure(lambda world: world.play(), repeat=3, setup=lambda: fbu.make_world(nets, settings, seed=0))
+        yield record('world_play', {'birds': n, 'backend': 'numba'}, play)
+
+def bench_net(quick):
+    """
+    Mide `NeuralNet.__call__`, `NeuralNet.encode` y `NeuralNet.decode`, así
+    como la evaluación de toda una población con `PopulationNet`.
+    """
+    hidden = [6, 32] if quick else [6, 32, 128]
+    for h in hidden:
+        for flat in [False, True]:
+            net = nn.NeuralNet(layer_sizes(h), ['sigmoid']*2, 'binary', flat=flat)
+            params = {'layers': layer_sizes(h), 'flat': flat}
+            x = np.array([1.0, 0.5])
+            yield record('net_call', params, measure(lambda: net(x), number=1000))
+            yield record('net_encode', params, measure(net.encode, number=1000))
+            genome = net.encode().copy()
+            yield record('net_decode', params, measure(lambda: net.decode(genome), number=1000))
+        for n in ([100] if quick else [100, 10000]):
+            pop = nn.PopulationNet(random_nets(n, settings_with(LAYER_SIZES=layer_sizes(h))))
+            x = np.random.normal(size=(n, 2))
+            yield record('population_call', {'layers': layer_sizes(h), 'birds': n},
+                         measure(lambda: pop(x), number=20))
+
+def bench_ga(quick):
+    """
+    Mide `ga.new_generation` con ambos métodos de selección.
+    """
+    sizes = [100, 1000] if quick else [100, 1000, 10000]
+    for selection in ['tournament', 'roulette']:
+        for n in sizes:
+            settings = settings_with(SELECTION=selection)
+            birds = []
+            for net in random_nets(n, settings):
+                b = fb.Bird(net, settings)
+                b.fitness = random.random()
+                birds.append(b)
+            yield record('new_generation', {'birds': n, 'selection': selection},
+                         measure(lambda: ga.new_generation(birds, settings), repeat=3))
+
+def bench_trainer(quick):
+    """
+    Mide `Trainer.train` con los distintos métodos de reparto y número de procesos.
+    """
+    processes = [1, 2] if quick else [1, 2, 4, 8]
+    birds = 40 if quick else 200
+    generations = 2 if quick else 5
+    settings = settings_with(MAX_STEPS=500)
+    for method in ['new', 'old', 'shared']:
+        for p in processes:
+            def train():
+                fbu.Trainer(settings, birds, p, seed=0).train(generations, method=method)
+            times = measure(train, repeat=1 if quick else 3)
+            yield record('trainer_train', {'method': method, 'processes': p, 'birds': birds,
+                                           'generations': generations}, times)
+
+def bench_render(quick):
+    """
+    Mide `World.play(draw=True)` por cuadro, con cada forma de dibujar y de escribir los cuadros.
+    """
+    frames = 20 if quick else 100
+    settings = settings_with(MAX_STEPS=frames)
+    nets = random_nets(20, settings)
+    for kind, processes in [('raster', 1), ('raster', 2), ('figure', 1)]:
+        for output in ['', 'replay.gif']:
+            if output and processes > 1: # El gif se escribe en un solo proceso
+                continue
+            def play():
+                with tempfile.TemporaryDirectory() as path:
+                    world = fbu.make_world(nets, settings, seed=0)
+                    world.play(draw=True, path=os.path.join(path, output), max_steps=frames,
+                               processes=processes, kind=kind)
+            times = measure(play, repeat=1 if quick else 3)
+            yield record('render_frame', {'kind': kind, 'processes': processes, 'output': output or 'png'},
+                         [t/frames for t in times])
+
+def train_curves(settings, seeds, birds, generations):
+    """
+    Entrena una vez por semilla, con `random` y `numpy.random` fijados a la misma semilla, y regresa la curva
+    de fitness promedio de cada entrenamiento.
+
+    Salida
+    ------
+    curves : numpy.array
+        Arreglo de la forma `seeds x generations`.
+    """
+    curves = []
+    for seed in range(seeds):
+        np.random.seed(seed)
+        random.seed(seed)
+        with fbu.Trainer(settings, birds, 1, seed=seed) as trainer:
+            _, fit = trainer.train(generations)
+        curves.append(fit.summary('mean'))
+    return np.array(curves)
+
+def equivalence_test(a, b, tolerance=0.1, alpha=0.05, resamples=10000, seed=0):
+    """
+    Prueba de equivalencia pareada, generación por generación, entre dos familias de curvas: en cada
+    generación, la media de las diferencias está a menos de `tolerance` veces la media de `b`.
+
+    Parámetros
+    ----------
+    a, b : numpy.array
+        Arreglos de la forma `semillas x generaciones`. El renglón `i` de ambos usa la misma semilla.
+
+    tolerance : float = 0.1
+        Diferencia máxima aceptada, relativa a la curva media de `b`.
+
+    alpha : float = 0.05
+        Nivel de cada una de las dos pruebas unilaterales.
+
+    resamples : int = 10000
+        Número de remuestreos bootstrap de las semillas.
+
+    seed : int = 0
+        Semilla de los remuestreos.
+
+    Salida
+    ------
+    out : dict
+        Diccionario con el intervalo `(low, high)` de la diferencia media y el margen `margin` de cada
+        generación, y `equivalent`, que indica si el intervalo está dentro de `(-margin, margin)` en todas.
+
+    Notas
+    -----
+    Es la versión con intervalo de confianza de la prueba TOST: el intervalo bootstrap de nivel
+    `1 - 2*alpha` queda dentro del margen si y sólo si ambas pruebas unilaterales rechazan que la diferencia
+    esté fuera de él. A diferencia de no rechazar que las curvas sean iguales, esto sí es evidencia de que lo
+    son, y con pocas semillas el intervalo es ancho y la prueba falla.
+    """
+    a, b = np.asarray(a, dtype=float), np.asarray(b, dtype=float)
+    d = a - b
+    rows = np.random.default_rng(seed).integers(len(d), size=(resamples, len(d)))
+    means = d[rows].mean(axis=1) # remuestreos x generaciones
+    low, high = np.percentile(means, [100*alpha, 100*(1 - alpha)], axis=0)
+    margin = tolerance*np.abs(b.mean(axis=0))
+    return {'low': low, 'high': high, 'margin': margin,
+            'equivalent': bool(np.all((low > -margin) & (high < margin)))}
+
+def bench_dtype(quick):
+    """
+    Compara `settings['DTYPE']` de 32 y 64 bits: el tamaño de los cromosomas que se envían a la pool, la
+    evaluación de la población y las curvas de entrenamiento. La curva de fitness promedio de cada semilla
+    se guarda en `curves`; el registro de 32 bits agrega el resultado de `equivalence_test` contra 64 bits.
+    La prueba que lo exige está en `test_dtype.py`.
+    """
+    birds = 100 if quick else 1000
+    seeds = 5 if quick else 20
+    generations = 5 if quick else 15
+    curves = {}
+    for dtype in ['float64', 'float32']:
+        settings = settings_with(DTYPE=dtype, VECTORIZED=True, MAX_STEPS=1000)
+        nets = random_nets(birds, settings)
+        genomes = [n.encode() for n in nets]
+        pop = nn.PopulationNet(nets)
+        x = np.random.normal(size=(birds, 2))
+        yield record('dtype_population_call', {'dtype': dtype, 'birds': birds},
+                     measure(lambda: pop(x), number=20), bytes=len(pickle.dumps(genomes)))
+        yield record('dtype_new_generation', {'dtype': dtype, 'birds': birds},
+                     measure(lambda: ga.next_generation(np.stack(genomes), np.random.random(birds), settings),
+                             repeat=3))
+        def train():
+            curves[dtype] = train_curves(settings, seeds, birds//10, generations)
+        times = measure(train, repeat=1)
+        fitness = curves[dtype][:, -1]
+        extra = {}
+        if dtype != 'float64':
+            test = equivalence_test(curves[dtype], curves['float64'])
+            extra = dict(low=test['low'].tolist(), high=test['high'].tolist(),
+                         margin=test['margin'].tolist(), equivalent=test['equivalent'])
+        yield record('dtype_train', {'dtype': dtype, 'birds': birds//10, 'generations': generations,
+                                     'seeds': seeds}, times, curves=curves[dtype].tolist(),
+                     curve=curves[dtype].mean(axis=0).tolist(), fitness_mean=float(np.mean(fitness)),
+                     fitness_std=float(np.std(fitness)), **extra)
+
+def bench_startup(quick):
+    """
+    Mide el arranque en frío: importar cada módulo en un intérprete nuevo, y crear una pool cuyos procesos
+    ejecutan `init_worker` y una tarea vacía. Con 'spawn' cada proceso importa `bird_utils` desde cero, como
+    en Windows y macOS; con 'fork' los hereda del proceso principal.
+    """
+    here = os.path.dirname(os.path.abspath(__file__))
+    code = "import time; t = time.perf_counter(); import {}; print(time.perf_counter() - t)"
+    for module in ['neural_network', 'bird', 'bird_utils']:
+        def load():
+            out = subprocess.run([sys.executable, '-c', code.format(module)], cwd=here, capture_output=True,
+                                 text=True, check=True)
+            return float(out.stdout)
+        times = [load() for _ in range(3 if quick else 10)]
+        yield record('import', {'module': module}, times)
+    settings = settings_with()
+    for method in ['fork', 'spawn']:
+        for p in ([1] if quick else [1, 4]):
+            def start():
+                pool = fbu.mp.get_context(method).Pool(p, initializer=fbu.init_worker, initargs=(settings,))
+                pool.map(abs, range(p), chunksize=1) # Una tarea vacía por proceso
+                pool.close()
+                pool.join()
+            yield record('pool_startup', {'method': method, 'processes': p},
+                         measure(start, repeat=2 if quick else 5))
+
+BENCHMARKS = {'world': bench_world,
+              'net': bench_net,
+              'ga': bench_ga,
+              'trainer': bench_trainer,
+              'render': bench_render,
+              'dtype': bench_dtype,
+              'startup': bench_startup}
+
+def version():
+    """
+    Información de la versión del código y del entorno.
+    """
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {'commit': commit,
+            'python': platform.python_version(),
+            'numpy': np.__version__}
+
+def run(names, quick=False, output=None):
+    """
+    Ejecuta los grupos de benchmarks dados e imprime cada resultado como una
+    línea de JSON.
+
+    Parámetros
+    ----------
+    names : list
+        Nombres de los grupos a ejecutar (véase `BENCHMARKS`).
+
+    quick : bool = False
+        Si usar barridos pequeños.
+
+    output : str = None
+        Archivo donde guardar los resultados, además de imprimirlos.
+
+    Salida
+    ------
+    results : list
+        Lista de registros.
+    """
+    info = version()
+    results = []
+    for name in names:
+        for r in BENCHMARKS[name](quick):
+            r.update(info)
+            results.append(r)
+            print(json.dumps(r), flush=True)
+    if output is not None:
+        with open(output, 'w') as f:
+            for r in results:
+                f.write(json.dumps(r) + '\n')
+    return results
+
+def load(path):
+    """
+    Lee un archivo de resultados.
+    """
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def compare(old, new):
+    """
+    Imprime la aceleración de cada benchmark de `new` respecto a `old`.
+
+    Parámetros
+    ----------
+    old, new : str
+        Archivos de resultados.
+    """
+    def key(r):
+        return r['benchmark'], json.dumps(r['params'], sort_keys=True)
+    before = {key(r): r for r in load(old)}
+    for r in load(new):
+        k = key(r)
+        if k not in before:
+            continue
+        speedup = before[k]['best'] / r['best']
+        print("{:<16} {:<70} {:>12.3g}s {:>12.3g}s {:>8.2f}x".format(
+              k[0], k[1], before[k]['best'], r['best'], speedup))
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmarks del simulador de Flappy Bird.")
+    parser.add_argument('--only', nargs='+', choices=list(BENCHMARKS), default=list(BENCHMARKS),
+                        help="Grupos de benchmarks a ejecutar.")
+    parser.add_argument('--quick', action='store_true', help="Usar barridos pequeños.")
+    parser.add_argument('--output', help="Archivo JSONL donde guardar los resultados.")
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'),
+                        help="Comparar dos archivos de resultados.")
+    args = parser.parse_args()
+    np.random.seed(0)
+    random.seed(0)
+    if args.compare:
+        compare(*args.compare)
+        sys.exit()
+    run(args.only, args.quick, args.output)
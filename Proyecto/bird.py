@@ -1,16 +1,16 @@
 """
 Este archivo implementa clases para simular el juego de Flappy Bird.
-"""
 
-import matplotlib.pyplot as plt
-from matplotlib.patches import Rectangle, Circle
-from itertools import islice
-from operator import itemgetter
+La simulación no depende de matplotlib: sólo los métodos `plot` y
+`World.play(draw=True)` lo importan, al usarse por primera vez, para que los
+procesos que sólo simulan arranquen rápido.
+"""
 
 import random
 import numpy as np
-import os
-import multiprocessing as mp
+
+import neural_network as nn
+from trajectory import Trajectory
 
 def intersects(center, radius,
                xy, width, height):
@@ -53,6 +53,167 @@ def intersects(center, radius,
     
     corner = (cdistx - width/2)**2 + (cdisty - height/2)**2
     return corner <= radius**2
+
+def intersects_array(center, radius,
+                     xy, width, height):
+    """
+    Versión vectorizada de `intersects`, para muchos círculos a la vez.
+    
+    Parámetros
+    ----------
+    center : list-like
+        Lista de la forma [x,y], donde `x` y `y` pueden ser arreglos de numpy
+        con las coordenadas de los centros de los círculos.
+        
+    radius : float
+        Radio de los círculos.
+        
+    xy : list-like
+        Lista de la forma [x,y], siendo las coordenadas del centro del rectángulo.
+    
+    width : float
+        Ancho del rectángulo.
+        
+    height : float
+        Alto del rectángulo
+        
+    Salida
+    ------
+    intersects : numpy.array
+        Arreglo booleano que indica qué círculos intersectan el rectángulo.
+    """
+    cdistx, cdisty = np.abs(center[0] - xy[0]), np.abs(center[1] - xy[1])
+    
+    far = (cdistx > width/2 + radius) | (cdisty > height/2 + radius)
+    inside = (cdistx <= width/2) | (cdisty <= height/2)
+    corner = (cdistx - width/2)**2 + (cdisty - height/2)**2 <= radius**2
+    return ~far & (inside | corner)
+
+def pipe_schedule(settings, rng, n):
+    """
+    Genera la altura de la apertura de una secuencia de tuberías.
+    
+    Parámetros
+    ----------
+    settings : dict
+        Diccionario de configuración.
+        
+    rng : numpy.random.Generator
+        Generador de números aleatorios.
+        
+    n : int
+        Número de tuberías.
+        
+    Salida
+    ------
+    heights : numpy.array
+        Arreglo de tamaño `n` con la posición vertical del centro de la apertura
+        de cada tubería, en el orden en que aparecen.
+    """
+    MINIMUM_HEIGHT = settings['MINIMUM_HEIGHT']
+    TOP = settings['TOP']
+    return MINIMUM_HEIGHT + rng.random(n) * (TOP - 2*MINIMUM_HEIGHT)
+
+def course_seeds(seed, courses):
+    """
+    Genera las semillas de varios recorridos a partir de la semilla de uno.
+    
+    Parámetros
+    ----------
+    seed : {int, numpy.random.Generator}
+        Semilla o generador del primer recorrido, que se usa tal cual, de modo
+        que con un solo recorrido el mundo es el mismo que sin recorridos
+        adicionales. Si es `None`, todos los recorridos son aleatorios.
+        
+    courses : int
+        Número de recorridos.
+        
+    Salida
+    ------
+    seeds : list
+        Lista con la semilla de cada recorrido. Las de los recorridos
+        adicionales son independientes entre sí (véase `numpy.random.SeedSequence`).
+    """
+    if seed is None:
+        return [None] * courses
+    if isinstance(seed, np.random.Generator):
+        extra = seed.integers(2**63, size=courses - 1)
+    elif isinstance(seed, np.random.SeedSequence):
+        extra = seed.spawn(courses - 1)
+    else:
+        extra = np.random.SeedSequence(seed).spawn(courses - 1)
+    return [seed] + list(extra)
+
+def aggregate_fitness(fitness, how='mean'):
+    """
+    Resume el fitness de cada individuo en varios recorridos.
+    
+    Parámetros
+    ----------
+    fitness : numpy.array
+        Arreglo de la forma `recorridos x individuos`.
+        
+    how : {str, float} = 'mean'
+        Forma de resumir: 'mean', 'min', 'median', o un número entre 0 y 1
+        para usar ese cuantil. El mínimo y los cuantiles bajos favorecen a los
+        individuos que no dependen de tener suerte con las tuberías.
+        
+    Salida
+    ------
+    fit : numpy.array
+        Fitness de cada individuo.
+    """
+    if how == 'mean':
+        return fitness.mean(axis=0)
+    elif how == 'min':
+        return fitness.min(axis=0)
+    elif how == 'median':
+        return np.median(fitness, axis=0)
+    elif isinstance(how, (int, float)) and 0 <= how <= 1:
+        return np.quantile(fitness, how, axis=0)
+    raise ValueError("Forma de resumir el fitness desconocida: {!r}".format(how))
+
+def course_length(settings):
+    """
+    Calcula una cota superior del número de tuberías que aparecen en un mundo
+    que dura `settings['MAX_STEPS']` pasos.
+    """
+    MAX_STEPS = settings['MAX_STEPS']
+    VX = settings['VX']
+    DT = settings['DT']
+    RIGHT = settings['RIGHT']
+    PIPE_WIDTH = settings['PIPE_WIDTH']
+    BIRD_RADIUS = settings['BIRD_RADIUS']
+    
+    distance = (MAX_STEPS + 2) * abs(VX) * DT # Distancia recorrida por cada tubería
+    period = RIGHT + PIPE_WIDTH + BIRD_RADIUS # Distancia entre que aparece y se recicla
+    return 2 + 2*(int(distance/period) + 1)
+
+def collisions(y, radius, pipes):
+    """
+    Determina qué pájaros chocan contra el piso o contra alguna tubería, con
+    una sola operación sobre todos los pájaros y todas las tuberías.
+    
+    Parámetros
+    ----------
+    y : numpy.array
+        Posición vertical de cada pájaro. Todos están en la posición horizontal 0.
+        
+    radius : float
+        Radio de los pájaros.
+        
+    pipes : list
+        Lista de objetos `Pipe`.
+        
+    Salida
+    ------
+    dead : numpy.array
+        Arreglo booleano que indica qué pájaros chocaron.
+    """
+    y = np.asarray(y)
+    rects = np.concatenate([p.rects for p in pipes]) # Un renglón por rectángulo
+    hits = intersects_array([0, y[:, None]], radius, [rects[:, 0], rects[:, 1]], rects[:, 2], rects[:, 3])
+    return (y - radius <= 0) | hits.any(axis=1)
     
 class Bird:
     """
@@ -101,6 +262,10 @@ class Bird:
         
     network : NeuralNet
         Red neuronal con la que decide si aletear o no.
+
+    inputs : numpy.array
+        Arreglo reservado para la entrada de la red, que se reutiliza en cada
+        paso.
     """
     def __init__(self, network, settings):
         self.BIRD_RADIUS = settings['BIRD_RADIUS']
@@ -115,6 +280,7 @@ class Bird:
         self.alive = True
         self.fitness = 0
         self.network = network
+        self.inputs = np.empty(2, dtype=getattr(network, 'dtype', float))
         
     def __repr__(self): # Cómo imprimir el objeto
         return 'y: ' + str(self.y) + '\n' + \
@@ -146,7 +312,11 @@ class Bird:
         """
         Avanza el pájaro una unidad de tiempo, decidiendo si aletear o no.
         """
-        choice = self.network([pipe.x, self.y-pipe.y])
+        if not self.alive: # Un pájaro muerto ni siquiera evalúa su red
+            return
+        self.inputs[0] = pipe.x
+        self.inputs[1] = self.y - pipe.y
+        choice = self.network(self.inputs)
         self.move(choice)
                 
     def plot(self, ax, draw_dead=False, color=None):
@@ -158,6 +328,7 @@ class Bird:
         ax : matplotlib.axes
             Objeto de ejes sobre el cual graficar.
         """
+        from matplotlib.patches import Circle
         if not self.alive and not draw_dead:
             return
         c = Circle((0, self.y), self.BIRD_RADIUS, color=color)
@@ -175,6 +346,10 @@ class Pipe:
 
     settings : dict
         Diccionario de configuración.
+        
+    y : float = None
+        Posición vertical del centro de la apertura. Si es `None`, se escoge
+        de manera aleatoria con el módulo `random`.
     
     Atributos
     ---------
@@ -200,8 +375,18 @@ class Pipe:
         Posición horizontal.
 
     y : Posición vertical del centro de la apertura.
+
+    rects : numpy.array
+        Arreglo de la forma `2 x 4` con la geometría de las tuberías de abajo y
+        de arriba, en ese orden. Cada renglón es `[cx, cy, ancho, alto]`, siendo
+        `(cx, cy)` el centro del rectángulo. Se calcula al crear la tubería y
+        se actualiza cada vez que se mueve.
+
+    index : int
+        Índice en el recorrido del mundo (`World.schedule`) de la altura
+        actual, o `None` si la tubería no pertenece a un mundo.
     """
-    def __init__(self, x, settings):
+    def __init__(self, x, settings, y=None):
         self.MINIMUM_HEIGHT = settings['MINIMUM_HEIGHT']
         self.PIPE_WIDTH = settings['PIPE_WIDTH']
         self.PIPE_GAP = settings['PIPE_GAP']
@@ -209,14 +394,40 @@ class Pipe:
         self.VX = settings['VX']
         self.DT = settings['DT']
         
+        if y is None:
+            y = self.MINIMUM_HEIGHT  + random.random() * (self.TOP - 2*self.MINIMUM_HEIGHT)
+        self.index = None
+        self.reset(x, y)
+        
+    def reset(self, x, y):
+        """
+        Coloca la tubería en una posición nueva, para reutilizarla.
+
+        Parámetros
+        ----------
+        x : float
+            Posición horizontal.
+
+        y : float
+            Posición vertical del centro de la apertura.
+        """
         self.x = x
-        self.y = self.MINIMUM_HEIGHT  + random.random() * (self.TOP - 2*self.MINIMUM_HEIGHT)
+        self.y = y
+        
+        height_bot = self.y - self.PIPE_GAP/2
+        height_top = self.TOP - self.y - self.PIPE_GAP/2
+        cx = self.x + self.PIPE_WIDTH/2
+        cy_bot = height_bot/2
+        cy_top = self.y + self.PIPE_GAP/2 + height_top/2
+        self.rects = np.array([[cx, cy_bot, self.PIPE_WIDTH, height_bot],
+                               [cx, cy_top, self.PIPE_WIDTH, height_top]])
         
     def step(self):
         """
         Desplaza la tubería una unidad de tiempo.
         """
         self.x += self.VX * self.DT
+        self.rects[:, 0] = self.x + self.PIPE_WIDTH/2
         
     def plot(self, ax):
         """
@@ -227,6 +438,7 @@ class Pipe:
         ax : matplotlib.axes
             Ejes sobre los cuales graficar
         """
+        from matplotlib.patches import Rectangle
         r1 = Rectangle((self.x, 0), self.PIPE_WIDTH, self.y - self.PIPE_GAP/2)
         r2 = Rectangle((self.x, self.y + self.PIPE_GAP/2), self.PIPE_WIDTH, self.TOP)
         ax.add_patch(r1)
@@ -244,14 +456,36 @@ class World:
 
     settings : dict
         Diccionario de configuración
+
+    seed : {int, numpy.random.Generator} = None
+        Semilla o generador con el que se genera el recorrido de tuberías. Dos
+        mundos con la misma semilla tienen exactamente las mismas tuberías.
+
+    record : bool = False
+        Si grabar la trayectoria de los pájaros y las tuberías en cada paso.
     
     Atributos
     ---------
     birds : list
         Lista de objetos `Bird` representando los pájaros en el mundo.
 
+    active : list
+        Lista de los pájaros que siguen vivos. Se compacta conforme mueren, de
+        modo que el trabajo de cada paso es proporcional a los sobrevivientes.
+
     pipes : list
-        Lista de objetos `Pipe` representando las tuberías.
+        Lista de objetos `Pipe` representando las tuberías. Tiene tamaño fijo:
+        cuando una tubería sale del mundo se reutiliza como la siguiente.
+
+    rng : numpy.random.Generator
+        Generador con el que se genera el recorrido.
+
+    schedule : numpy.array
+        Altura de la apertura de cada tubería del recorrido, precalculada con
+        `pipe_schedule`.
+
+    next_pipe : int
+        Índice en `schedule` de la siguiente tubería que aparecerá.
 
     steps : int = 0
         Cuántos pasos temporales se han dado. Al inicio es cero
@@ -259,16 +493,82 @@ class World:
     alive : bool = True
         Si el mundo está vivo (i.e., al menos un pájaro está vivo y no se ha
         alcanzado el límite de pasos). Al inicio es Verdadero.
+
+    trajectory : Trajectory
+        Trayectoria grabada desde el estado inicial, o `None` si `record=False`.
+
+    Notas
+    -----
+    Con `settings['COMPILE_NETS']` verdadero, las redes se compilan al crear
+    el mundo (véase `NeuralNet.compile`), de modo que la simulación no
+    reserva memoria en cada paso.
     """
-    def __init__(self, nets, settings):
-        PIPE_WIDTH = settings['PIPE_WIDTH']
-        RIGHT = settings['RIGHT']
+    def __init__(self, nets, settings, seed=None, record=False):
         self.settings = settings
 
+        if settings.get('COMPILE_NETS', False): # Evaluar las redes sin reservar memoria
+            for n in nets:
+                n.compile()
         self.birds = [Bird(n, settings) for n in nets]
-        self.pipes = [Pipe((RIGHT - PIPE_WIDTH)/2, settings), Pipe(RIGHT, settings)]
+        self.active = list(self.birds)
+        self.init_pipes(seed)
         self.steps = 0
         self.alive = True
+        self.init_trajectory(record)
+        
+    def init_pipes(self, seed=None):
+        """
+        Precalcula el recorrido de tuberías y crea las tuberías iniciales.
+
+        Parámetros
+        ----------
+        seed : {int, numpy.random.Generator} = None
+            Semilla o generador del recorrido.
+        """
+        PIPE_WIDTH = self.settings['PIPE_WIDTH']
+        RIGHT = self.settings['RIGHT']
+        
+        self.rng = np.random.default_rng(seed)
+        self.schedule = pipe_schedule(self.settings, self.rng, course_length(self.settings))
+        self.pipes = [Pipe((RIGHT - PIPE_WIDTH)/2, self.settings, self.schedule[0]),
+                      Pipe(RIGHT, self.settings, self.schedule[1])]
+        for i, p in enumerate(self.pipes):
+            p.index = i
+        self.next_pipe = 2
+
+    def init_trajectory(self, record):
+        """
+        Crea la trayectoria del mundo y graba el estado inicial, si `record`
+        es verdadero.
+        """
+        self.trajectory = None
+        if record:
+            y = self.state()[0]
+            self.trajectory = Trajectory(self.settings, len(y), len(self.pipes))
+            self.trajectory.record(*self.state())
+
+    def record_step(self):
+        """
+        Graba el estado actual en la trayectoria, y el fitness de cada pájaro
+        si el mundo ya terminó.
+        """
+        if self.trajectory is None:
+            return
+        self.trajectory.record(*self.state())
+        if not self.alive:
+            self.trajectory.fitness[:] = self.fitness()
+        
+    def next_height(self):
+        """
+        Regresa la altura de la siguiente tubería del recorrido. Si el recorrido
+        precalculado se termina, se extiende con el mismo generador.
+        """
+        if self.next_pipe == len(self.schedule):
+            more = pipe_schedule(self.settings, self.rng, len(self.schedule))
+            self.schedule = np.concatenate([self.schedule, more])
+        y = self.schedule[self.next_pipe]
+        self.next_pipe += 1
+        return y
         
     def check_collision(self):
         """
@@ -276,34 +576,16 @@ class World:
         contra el piso. Matando a los pájaros correspondientes en caso afirmativo.
         """
         BIRD_RADIUS = self.settings['BIRD_RADIUS']
-        PIPE_WIDTH = self.settings['PIPE_WIDTH']
-        PIPE_GAP = self.settings['PIPE_GAP']
-        TOP = self.settings['TOP']
         
-        i = 0
-        while i < len(self.birds):
-            b = self.birds[i]
-            
-            if not b.alive:
-                i += 1
-                continue
-                
-            if b.y - BIRD_RADIUS <= 0:
+        if not self.active:
+            return
+        dead = collisions([b.y for b in self.active], BIRD_RADIUS, self.pipes)
+        if not dead.any():
+            return
+        for b, d in zip(self.active, dead):
+            if d:
                 b.alive = False
-                i += 1
-                continue
-                
-            for p in self.pipes:
-                height_bot = p.y - PIPE_GAP/2
-                height_top = TOP - p.y - PIPE_GAP/2
-                cx = p.x + PIPE_WIDTH/2
-                cy_bot = height_bot/2
-                cy_top = p.y + PIPE_GAP/2 + height_top/2
-                if intersects([0, b.y], BIRD_RADIUS, [cx, cy_bot], PIPE_WIDTH, height_bot) \
-                or intersects([0, b.y], BIRD_RADIUS, [cx, cy_top], PIPE_WIDTH, height_top):
-                    b.alive = False
-                    break
-            i += 1
+        self.active = [b for b in self.active if b.alive] # Compactamos los vivos
             
     def step_pipes(self):
         """
@@ -324,22 +606,24 @@ class World:
             p.step()
             if p.x + PIPE_WIDTH + BIRD_RADIUS < 0: # si la tubería se sale de los límites del mundo
                 self.pipes.pop(i)                  # la quitamos de la lista de tuberías
-                self.pipes.append(Pipe(RIGHT, self.settings)) # y creamos una nueva
+                p.reset(RIGHT, self.next_height()) # y la reutilizamos como la siguiente
+                p.index = self.next_pipe - 1
+                self.pipes.append(p)
                 passed_pipe = True                 # lograron librar una tubería
         return passed_pipe
     
     def step_birds(self):
         """
-        Mueve todos los pájaros una unidad de tiempo.
+        Mueve todos los pájaros vivos una unidad de tiempo.
 
         Notas
         -----
-        Se llama el método `.step` para todos los pájaros, el cual requiere como
+        Se llama el método `.step` para todos los pájaros vivos, el cual requiere como
         entrada la ubicación de la tubería más cercana. Por construcción, dicha
         tubería siempre es la primera entrada de la lista `self.pipes`, por lo
         cual pasamos este atributo.
         """
-        for b in self.birds:
+        for b in self.active:
             b.step(self.pipes[0])
         
     def step(self):
@@ -355,11 +639,12 @@ class World:
 
         self.check_collision()
         self.steps += 1
-        if not any([b.alive for b in self.birds]) or self.steps > MAX_STEPS:
+        if not self.active or self.steps > MAX_STEPS:
             self.alive = False
             
-        for b in self.birds:
-            b.fitness += b.alive*(ALIVE_REWARD + passed_pipe*PIPE_REWARD)
+        for b in self.active: # Los muertos no suman nada
+            b.fitness += ALIVE_REWARD + passed_pipe*PIPE_REWARD
+        self.record_step()
                 
     def fitness(self):
         """
@@ -371,6 +656,22 @@ class World:
             Lista con el fitness de cada pájaro.
         """
         return [b.fitness for b in self.birds]
+
+    def state(self):
+        """
+        Regresa el estado visible del mundo, lo necesario para dibujarlo.
+
+        Salida
+        ------
+        out : tuple
+            Tupla `(y, alive, pipe_x, pipe_y)` de arreglos con la posición
+            vertical de cada pájaro, si sigue vivo, y la posición horizontal y
+            la altura de la apertura de cada tubería.
+        """
+        return np.array([b.y for b in self.birds]), \
+               np.array([b.alive for b in self.birds], dtype=bool), \
+               np.array([p.x for p in self.pipes]), \
+               np.array([p.y for p in self.pipes])
         
     def plot(self, ax, draw_dead=False):
         """
@@ -393,7 +694,7 @@ class World:
             for b in self.birds:                
                 b.plot(ax, draw_dead=draw_dead)
 
-    def play(self, draw=False, path="./", max_steps=None):
+    def play(self, draw=False, path="./", max_steps=None, processes=1, fps=30, kind='raster'):
         """
         Ejecuta el mundo y opcionalmente grafica los resultados.
 
@@ -403,32 +704,409 @@ class World:
             Si dibujar cada cuadro de la ejecución.
 
         path : str = './'
-            Ubicación donde guardar los cuadros en caso de que `draw=True`.
+            Ubicación donde guardar los cuadros en caso de que `draw=True`. Si
+            es un directorio se guarda un PNG por cuadro; si termina en `.gif`
+            o en una extensión de video como `.mp4`, una sola animación (véase
+            `render.FrameWriter`).
 
         max_steps : int = None
             Máximo número de pasos a ejecutar.
+
+        processes : int = 1
+            Número de procesos que dibujan y codifican los PNG en paralelo.
+
+        fps : int = 30
+            Cuadros por segundo de la animación.
+
+        kind : str = 'raster'
+            Forma de dibujar los cuadros: 'raster' pinta directamente sobre un
+            arreglo de numpy, y 'figure' reutiliza una sola figura de
+            matplotlib (véase `render`).
+
+        Notas
+        -----
+        Los cuadros se dibujan a partir de `self.state()`, así que no se crea
+        una figura nueva por cuadro.
         """
         MAX_STEPS = self.settings['MAX_STEPS']
-        RIGHT = self.settings['RIGHT']
-        TOP = self.settings['TOP']
         
         i = 0
         if max_steps is None:
             max_steps = MAX_STEPS
-        while self.alive and i < max_steps:
-            self.step()
+        if draw:
+            import render
+            writer = render.FrameWriter(path, self.settings, len(self.state()[0]), processes, fps, kind)
+        try:
+            while self.alive and i < max_steps:
+                self.step()
+                if draw:
+                    writer.write(self.state())
+                i += 1
+        finally:
             if draw:
-                fig, ax = plt.subplots(figsize=(10,10))
-                ax.set_xlim(-1, RIGHT)
-                ax.set_ylim(0, TOP)
-                ax.set_aspect('equal')
-                self.plot(ax)
-                ax.tick_params(left=False,
-                bottom=False,
-                labelleft=False,
-                labelbottom=False)
-                name = str(i).rjust(5,'0') + ".png"
-                fig.savefig(os.path.join(path, name), bbox_inches='tight', dpi=200)
-                plt.close()
-            i += 1
-        return self.birds
\ No newline at end of file
+                writer.close()
+        if self.trajectory is not None:
+            self.trajectory.fitness[:] = self.fitness()
+        return self.birds
+
+class VectorWorld(World):
+    """
+    Mundo equivalente a `World`, pero que guarda el estado de todos los pájaros
+    en arreglos de numpy y los avanza de manera vectorizada. La física es la
+    misma que la de `Bird.move` y las recompensas las mismas que las de
+    `World.step`.
+
+    Parámetros
+    ----------
+    nets : list
+        Lista de objetos de tipo `NeuralNet` que asignar a cada pájaro.
+
+    settings : dict
+        Diccionario de configuración
+
+    seed : {int, numpy.random.Generator} = None
+        Semilla o generador con el que se genera el recorrido de tuberías.
+
+    record : bool = False
+        Si grabar la trayectoria de los pájaros y las tuberías en cada paso.
+
+    courses : int = None
+        Número de recorridos en los que se evalúa cada red. Por omisión es
+        `settings.get('COURSES', 1)`.
+    
+    Atributos
+    ---------
+    networks : list
+        Lista de redes de cada pájaro.
+
+    courses : int
+        Número de recorridos.
+
+    course : numpy.array
+        Recorrido de cada una de las `courses * len(networks)` copias de los
+        pájaros. La copia `k*len(networks) + i` es el pájaro `i` en el
+        recorrido `k`.
+
+    schedules : numpy.array
+        Arreglo de la forma `courses x tuberías` con la altura de la apertura
+        de cada tubería de cada recorrido. El primer renglón es `schedule`.
+
+    network : PopulationNet
+        Red de población que evalúa las redes de todos los pájaros a la vez.
+
+    active : numpy.array
+        Índices de los pájaros que siguen vivos. Se compacta conforme mueren.
+
+    active_network : PopulationNet
+        Red de población con sólo las redes de `active`.
+
+    y : numpy.array
+        Posición vertical de cada copia de los pájaros.
+
+    vy : numpy.array
+        Velocidad vertical de cada copia.
+
+    birds_alive : numpy.array
+        Arreglo booleano que indica qué copias siguen vivas.
+
+    birds_fitness : numpy.array
+        Aptitud de cada copia.
+
+    pipes : list
+        Lista de objetos `Pipe` representando las tuberías.
+
+    steps : int = 0
+        Cuántos pasos temporales se han dado. Al inicio es cero
+
+    alive : bool = True
+        Si el mundo está vivo (i.e., al menos un pájaro está vivo y no se ha
+        alcanzado el límite de pasos). Al inicio es Verdadero.
+
+    trajectory : Trajectory
+        Trayectoria grabada desde el estado inicial, o `None` si `record=False`.
+
+    Notas
+    -----
+    El atributo `birds` no se guarda, sino que se construye a partir de los
+    arreglos cada vez que se consulta, de modo que el mundo se puede usar en
+    lugar de `World` (por ejemplo, en `World.play` o `bird_utils.best_world`).
+
+    Con varios recorridos, todas las copias se simulan juntas en los mismos
+    arreglos: las tuberías de todos los recorridos avanzan igual y sólo
+    cambia la altura de su apertura, así que comparten `pipes` y cada copia
+    consulta la altura de su recorrido en `schedules`. `fitness` resume el de
+    las copias de cada pájaro con `settings.get('COURSE_AGGREGATE', 'mean')`
+    (véase `aggregate_fitness`), y `state` y `birds` describen el primer
+    recorrido, que es el que se dibuja.
+    """
+    def __init__(self, nets, settings, seed=None, record=False, courses=None):
+        TOP = settings['TOP']
+        self.settings = settings
+        if courses is None:
+            courses = settings.get('COURSES', 1)
+
+        self.courses = courses
+        self.networks = list(nets)
+        n = courses * len(nets)
+        self.course = np.repeat(np.arange(courses), len(nets))
+        self.network = nn.PopulationNet(self.networks * courses)
+        self.y = np.full(n, TOP/2)
+        self.vy = np.zeros(n)
+        self.birds_alive = np.ones(n, dtype=bool)
+        self.birds_fitness = np.zeros(n)
+        self.active = np.arange(n)
+        self.active_network = self.network
+        self.init_pipes(seed)
+        self.steps = 0
+        self.alive = True
+        self.init_trajectory(record)
+
+    def init_pipes(self, seed=None):
+        """
+        Precalcula el recorrido de tuberías de cada recorrido (véase
+        `World.init_pipes`).
+        """
+        seeds = course_seeds(seed, self.courses)
+        super().init_pipes(seeds[0])
+        self.rngs = [self.rng] + [np.random.default_rng(s) for s in seeds[1:]]
+        self.schedules = np.stack([self.schedule] +
+                                  [pipe_schedule(self.settings, r, len(self.schedule)) for r in self.rngs[1:]])
+
+    def next_height(self):
+        """
+        Regresa la altura de la siguiente tubería del primer recorrido,
+        extendiendo todos los recorridos si se terminan.
+        """
+        if self.next_pipe == self.schedules.shape[1]:
+            more = [pipe_schedule(self.settings, r, self.schedules.shape[1]) for r in self.rngs]
+            self.schedules = np.concatenate([self.schedules, np.stack(more)], axis=1)
+            self.schedule = self.schedules[0]
+        return super().next_height()
+
+    @property
+    def birds(self):
+        n = len(self.networks)
+        alive = self.birds_alive.reshape(self.courses, n).any(axis=0)
+        birds = [Bird(net, self.settings) for net in self.networks]
+        for i, (b, f) in enumerate(zip(birds, self.fitness())):
+            b.y = float(self.y[i])
+            b.vy = float(self.vy[i])
+            b.alive = bool(alive[i])
+            b.fitness = float(f)
+        return birds
+
+    def check_collision(self):
+        """
+        Revisa si alguno de los pájaros chocó contra alguna de las tuberías, o
+        contra el piso. Matando a los pájaros correspondientes en caso afirmativo.
+        """
+        BIRD_RADIUS = self.settings['BIRD_RADIUS']
+        PIPE_GAP = self.settings['PIPE_GAP']
+        PIPE_WIDTH = self.settings['PIPE_WIDTH']
+        TOP = self.settings['TOP']
+
+        y = self.y[self.active]
+        if self.courses == 1:
+            dead = collisions(y, BIRD_RADIUS, self.pipes)
+        else:
+            # Rectángulos de `Pipe.reset`, con la altura del recorrido de cada copia
+            heights = self.schedules[self.course[self.active][:, None], [p.index for p in self.pipes]]
+            cx = np.array([p.x + PIPE_WIDTH/2 for p in self.pipes])
+            height_bot = heights - PIPE_GAP/2
+            height_top = TOP - heights - PIPE_GAP/2
+            hits = intersects_array([0, y[:, None]], BIRD_RADIUS, [cx, height_bot/2], PIPE_WIDTH, height_bot) | \
+                   intersects_array([0, y[:, None]], BIRD_RADIUS, [cx, heights + PIPE_GAP/2 + height_top/2],
+                                    PIPE_WIDTH, height_top)
+            dead = (y - BIRD_RADIUS <= 0) | hits.any(axis=1)
+        if dead.any():
+            self.birds_alive[self.active[dead]] = False
+            self.active = self.active[~dead] # Compactamos los vivos
+            self.active_network = self.network.subset(self.active)
+
+    def decide(self, pipe):
+        """
+        Calcula si cada pájaro vivo aletea o no, evaluando todas sus redes con
+        una sola llamada a `PopulationNet`.
+
+        Parámetros
+        ----------
+        pipe : Pipe
+            Tubería más cercana.
+
+        Salida
+        ------
+        flap : numpy.array
+            Arreglo booleano con la decisión de cada pájaro de `self.active`.
+        """
+        y = self.y[self.active]
+        if self.courses == 1:
+            x = np.column_stack([np.full(len(y), pipe.x), y - pipe.y])
+        else:
+            x = np.column_stack([np.full(len(y), pipe.x), y - self.schedules[self.course[self.active], pipe.index]])
+        flap = np.asarray(self.active_network(x))
+        if flap.ndim > 1: # Salida de la forma `N x m`: sólo importa la primera neurona
+            flap = flap[:, 0]
+        return flap.astype(bool)
+
+    def step_birds(self):
+        """
+        Mueve todos los pájaros vivos una unidad de tiempo, con la misma física
+        que `Bird.move`.
+        """
+        MIN_VELOCITY = self.settings['MIN_VELOCITY']
+        GRAVITY = self.settings['GRAVITY']
+        DT = self.settings['DT']
+        TOP = self.settings['TOP']
+        FLAP_SPEED = self.settings['FLAP_SPEED']
+
+        flap = self.decide(self.pipes[0])
+        y, vy = self.y[self.active], self.vy[self.active]
+        self.y[self.active] = np.minimum(y + (1/2 * GRAVITY * DT**2 + vy * DT), TOP)
+        vy = np.where(vy > MIN_VELOCITY, vy + GRAVITY * DT, vy)
+        self.vy[self.active] = np.where(flap, FLAP_SPEED, vy)
+
+    def step(self):
+        """
+        Mueve todos los objetos una unidad de tiempo, y revisa colisiones.
+        """
+        ALIVE_REWARD = self.settings['ALIVE_REWARD']
+        PIPE_REWARD = self.settings['PIPE_REWARD']
+        MAX_STEPS = self.settings['MAX_STEPS']
+        
+        passed_pipe = self.step_pipes()
+        self.step_birds()
+
+        self.check_collision()
+        self.steps += 1
+        if len(self.active) == 0 or self.steps > MAX_STEPS:
+            self.alive = False
+            
+        self.birds_fitness[self.active] += ALIVE_REWARD + passed_pipe*PIPE_REWARD
+        self.record_step()
+
+    def fitness(self):
+        """
+        Calcula el fitness de todos los pájaros en el mundo, resumido sobre
+        los recorridos.
+
+        Salida
+        ------
+        fit : list
+            Lista con el fitness de cada pájaro.
+        """
+        if self.courses == 1:
+            return self.birds_fitness.tolist()
+        return aggregate_fitness(self.course_fitness(), self.settings.get('COURSE_AGGREGATE', 'mean')).tolist()
+
+    def course_fitness(self):
+        """
+        Fitness de cada pájaro en cada recorrido, como un arreglo de la forma
+        `courses x len(networks)`.
+        """
+        return self.birds_fitness.reshape(self.courses, len(self.networks))
+
+    def state(self):
+        """
+        Regresa el estado visible del primer recorrido directamente de los
+        arreglos (véase `World.state`).
+        """
+        n = len(self.networks)
+        return self.y[:n], self.birds_alive[:n], \
+               np.array([p.x for p in self.pipes]), \
+               np.array([p.y for p in self.pipes])
+
+class JitWorld(VectorWorld):
+    """
+    Mundo equivalente a `VectorWorld`, pero que `play` simula completo con
+    una sola llamada a `kernels.rollout`, compilada con Numba. Da exactamente
+    el mismo fitness que `World` con la misma semilla.
+
+    Parámetros
+    ----------
+    nets : list
+        Lista de objetos de tipo `NeuralNet` que asignar a cada pájaro.
+
+    settings : dict
+        Diccionario de configuración. Las funciones de activación deben ser
+        las registradas en `neural_network` (véase `kernels.function_code`).
+
+    seed : {int, numpy.random.Generator} = None
+        Semilla o generador con el que se genera el recorrido de tuberías.
+
+    record : bool = False
+        Si grabar la trayectoria. Como el kernel no regresa los pasos
+        intermedios, un mundo que graba o dibuja se simula con `VectorWorld`.
+
+    Atributos
+    ---------
+    genomes : numpy.array
+        Arreglo de la forma `N x G` con el cromosoma de cada copia de los
+        pájaros (véase `VectorWorld.course`).
+
+    params : numpy.array
+        Constantes de la configuración que usa el kernel.
+
+    Notas
+    -----
+    Usar con `settings['BACKEND'] = 'numba'` (véase `bird_utils.make_world`).
+    """
+    def __init__(self, nets, settings, seed=None, record=False, courses=None):
+        super().__init__(nets, settings, seed, record, courses)
+        import kernels
+        LAYER_SIZES = settings['LAYER_SIZES']
+        GRAVITY = settings['GRAVITY']
+        DT = settings['DT']
+
+        self.rollout = kernels.rollout
+        self.hidden, self.last = kernels.activation_codes(settings)
+        self.sizes = np.array(LAYER_SIZES, dtype=np.int64)
+        genes = sum((a + 1)*b for a, b in zip(LAYER_SIZES, LAYER_SIZES[1:]))
+        genomes = np.array([n.encode() for n in nets], dtype=float).reshape(len(nets), genes)
+        self.genomes = np.tile(genomes, (self.courses, 1))
+        # Mismas operaciones que `Pipe.step` y `Bird.move`, para redondear igual
+        self.params = np.array([settings['VX'] * DT, settings['RIGHT'], settings['PIPE_WIDTH'],
+                                settings['PIPE_GAP'], settings['TOP'], settings['BIRD_RADIUS'],
+                                1/2 * GRAVITY * DT**2, DT, GRAVITY * DT, settings['MIN_VELOCITY'],
+                                settings['FLAP_SPEED'], settings['ALIVE_REWARD'], settings['PIPE_REWARD'],
+                                settings['MAX_STEPS']], dtype=float)
+
+    @staticmethod
+    def supported(settings):
+        """
+        Determina si Numba está instalado y todas las funciones de activación
+        de la configuración tienen equivalente en el kernel.
+        """
+        import kernels
+        return kernels.NUMBA and kernels.activation_codes(settings) is not None
+
+    def run(self, max_steps):
+        """
+        Simula hasta `max_steps` pasos con el kernel y actualiza el estado.
+        """
+        px = np.array([p.x for p in self.pipes], dtype=float)
+        index = np.array([p.index for p in self.pipes], dtype=np.int64)
+        order = np.arange(len(self.pipes))
+        self.steps, self.next_pipe, self.alive = self.rollout(
+            self.genomes, self.sizes, self.hidden, self.last, self.params, self.schedules, self.course,
+            self.y, self.vy, self.birds_alive, self.birds_fitness, px, index, order,
+            self.steps, self.next_pipe, max_steps)
+        pipes = self.pipes
+        self.pipes = [pipes[o] for o in order]
+        for o in order:
+            pipes[o].reset(px[o], self.schedule[index[o]])
+            pipes[o].index = int(index[o])
+        self.active = np.flatnonzero(self.birds_alive)
+        self.active_network = self.network.subset(self.active)
+
+    def play(self, draw=False, path="./", max_steps=None, processes=1, fps=30, kind='raster'):
+        """
+        Ejecuta el mundo con el kernel (véase `World.play`). Si `draw=True` o
+        el mundo graba su trayectoria, se simula paso por paso.
+        """
+        if draw or self.trajectory is not None:
+            return super().play(draw, path, max_steps, processes, fps, kind)
+        if max_steps is None:
+            max_steps = self.settings['MAX_STEPS']
+        if self.alive:
+            self.run(max_steps)
+        return self.birds
@@ -8,15 +8,767 @@ import bird as fb
 import genetic_algorithm as ga
 import numpy as np
 import multiprocess as mp # ¡multiprocess, NO multiprocessING! 
+from multiprocess import shared_memory
+from multiprocess.managers import BaseManager
+from instrumentation import Profiler
+from fitness_history import FitnessHistory
+from fitness_cache import FitnessCache, settings_digest
+
+import collections
+import json
+import os
+import queue
+import random
+import socket
+import threading
+import time
+import warnings
+
+_settings = None # Configuración de cada proceso de la pool, véase `init_worker`
+_template = None # Red usada para decodificar cromosomas en cada proceso
+_shared = None   # Población en memoria compartida de cada proceso
+_dispatcher = None # Repartidor de tareas del servidor de un `Coordinator`, véase `init_dispatcher`
 
 def wrapper(w): # Para poder llamar el método `play` en una pool
     return w.play()
 
+class SharedPopulation:
+    """
+    Matriz de cromosomas y vector de fitness de una población, guardados en
+    memoria compartida para que los procesos los lean y escriban sin copiarlos.
+    
+    Parámetros
+    ----------
+    size : int
+        Número de individuos.
+        
+    genes : int
+        Tamaño del cromosoma de cada individuo.
+        
+    names : tuple = None
+        Nombres de los bloques de memoria `(cromosomas, fitness)` a los que
+        conectarse. Si es `None`, se crean bloques nuevos.
+        
+    dtype : numpy.dtype = numpy.float64
+        Tipo de dato de los cromosomas (véase `settings['DTYPE']`).
+        
+    Atributos
+    ---------
+    genomes : numpy.array
+        Arreglo de la forma `size x genes`. El renglón `i` es el cromosoma del
+        i-ésimo individuo.
+        
+    fitness : numpy.array
+        Arreglo de tamaño `size` con el fitness de cada individuo.
+        
+    names : tuple
+        Nombres de los bloques de memoria, para conectarse desde otro proceso.
+    """
+    def __init__(self, size, genes, names=None, dtype=np.float64):
+        create = names is None
+        if create:
+            names = (None, None)
+        self.size = size
+        self.genes = genes
+        self.dtype = np.dtype(dtype)
+        self.memory = [shared_memory.SharedMemory(name=names[0], create=create,
+                                                  size=size*genes*self.dtype.itemsize),
+                       shared_memory.SharedMemory(name=names[1], create=create, size=size*8)]
+        self.genomes = np.ndarray((size, genes), dtype=self.dtype, buffer=self.memory[0].buf)
+        self.fitness = np.ndarray(size, dtype=np.float64, buffer=self.memory[1].buf)
+        self.names = tuple(m.name for m in self.memory)
+        
+    def close(self):
+        """
+        Desconecta este proceso de la memoria compartida.
+        """
+        self.genomes = self.fitness = None
+        for m in self.memory:
+            m.close()
+            
+    def unlink(self):
+        """
+        Libera la memoria compartida. Sólo debe llamarlo el proceso que la creó.
+        """
+        self.close()
+        for m in self.memory:
+            m.unlink()
+
+class BatchScheduler:
+    """
+    Escoge cuántos pájaros simular en cada tarea (un mundo) enviada a la pool, a partir del costo medido de
+    las generaciones anteriores.
+    
+    Parámetros
+    ----------
+    processes : int
+        Número de procesos de la pool.
+        
+    tasks_per_worker : int = 4
+        Número de tareas por proceso a buscar. Más tareas reparten mejor la carga cuando unos mundos duran
+        más que otros, pero cada tarea tiene un costo fijo.
+        
+    tolerance : float = 0.05
+        Fracción del tiempo de simulación de una tarea que se acepta gastar en su costo fijo.
+        
+    smoothing : float = 0.5
+        Peso de la última medición en el promedio móvil de los costos.
+        
+    Atributos
+    ---------
+    overhead : float
+        Costo fijo estimado de una tarea, en segundos: envío, creación del mundo y regreso de resultados.
+        Es `None` antes de la primera medición.
+        
+    per_bird : float
+        Tiempo estimado de simulación de un pájaro, en segundos. Es `None` antes de la primera medición.
+        
+    Notas
+    -----
+    El costo de una tarea con `b` pájaros se modela como `overhead + b * per_bird`. El tamaño escogido es el
+    menor que mantiene el costo fijo debajo de `tolerance` del tiempo de simulación, pero nunca mayor al que
+    da `tasks_per_worker` tareas por proceso, para no perder el balance de carga.
+    
+    El costo fijo se estima como el tiempo que los procesos no pasaron simulando: `processes` veces el tiempo
+    de la generación, menos la suma del tiempo reportado por cada tarea, entre el número de tareas.
+    """
+    def __init__(self, processes, tasks_per_worker=4, tolerance=0.05, smoothing=0.5):
+        self.processes = processes
+        self.tasks_per_worker = tasks_per_worker
+        self.tolerance = tolerance
+        self.smoothing = smoothing
+        self.overhead = None
+        self.per_bird = None
+        
+    def update(self, seconds, stats):
+        """
+        Actualiza los costos estimados con una generación simulada.
+        
+        Parámetros
+        ----------
+        seconds : float
+            Tiempo total de la generación en el proceso principal.
+            
+        stats : list
+            Estadísticas de cada tarea (véase `play_stats`).
+        """
+        busy = sum(s['seconds'] for s in stats)
+        birds = sum(s['birds'] for s in stats)
+        if not stats or birds == 0:
+            return
+        overhead = max(seconds*self.processes - busy, 0) / len(stats)
+        per_bird = busy / birds
+        if self.overhead is None:
+            self.overhead, self.per_bird = overhead, per_bird
+        else:
+            a = self.smoothing
+            self.overhead = a*overhead + (1 - a)*self.overhead
+            self.per_bird = a*per_bird + (1 - a)*self.per_bird
+        
+    def batch_size(self, birds):
+        """
+        Número de pájaros por tarea para una población.
+        
+        Parámetros
+        ----------
+        birds : int
+            Número de pájaros a simular.
+            
+        Salida
+        ------
+        size : int
+            Pájaros por tarea, al menos 1.
+        """
+        balanced = -(-birds // (self.processes*self.tasks_per_worker)) # División hacia arriba
+        if self.overhead is None: # Sin mediciones, sólo buscamos el balance
+            return max(balanced, 1)
+        needed = int(np.ceil(self.overhead / (self.tolerance*max(self.per_bird, 1e-12))))
+        return max(min(needed, balanced), 1)
+
+def init_worker(settings, shared=None):
+    """
+    Inicializa un proceso de la pool. Guarda la configuración y una red molde
+    para no tener que enviarlas en cada tarea.
+    
+    Parámetros
+    ----------
+    settings : dict
+        Diccionario de configuración.
+        
+    shared : tuple = None
+        Tupla `(size, genes, names, dtype)` para conectarse a una `SharedPopulation`.
+    """
+    global _settings, _template, _shared
+    _settings = settings
+    _template = nn.NeuralNet(settings['LAYER_SIZES'], settings['ACTIVATION_FUNCTIONS'],
+                             settings['LAST_ACTIVATION'], flat=settings.get('FLAT_GENOME', False),
+                             dtype=settings.get('DTYPE', float))
+    if shared is not None:
+        _shared = SharedPopulation(*shared)
+
+def play_genomes(genomes, seed=None):
+    """
+    Simula un mundo con pájaros cuyas redes están dadas por sus cromosomas. Se
+    ejecuta en un proceso inicializado con `init_worker`.
+    
+    Parámetros
+    ----------
+    genomes : list
+        Lista de cromosomas codificados (véase `NeuralNet.encode`).
+        
+    seed : int = None
+        Semilla del recorrido de tuberías.
+        
+    Salida
+    ------
+    out : tuple
+        Tupla de dos elementos. El primero es una lista con el fitness de cada
+        pájaro, y el segundo las estadísticas de la simulación (véase `play_stats`).
+    """
+    start = time.perf_counter()
+    nets = [_template.decode(g) for g in genomes]
+    world = make_world(nets, _settings, seed)
+    world.play()
+    return world.fitness(), play_stats(world, start)
+
+def play_range(bounds):
+    """
+    Simula un mundo con los individuos `start, ..., stop-1` de la población en
+    memoria compartida y escribe su fitness en ella. Se ejecuta en un proceso
+    inicializado con `init_worker`.
+    
+    Parámetros
+    ----------
+    bounds : tuple
+        Tupla `(start, stop, seed)` con el rango de individuos a simular y la
+        semilla del recorrido de tuberías.
+        
+    Salida
+    ------
+    stats : dict
+        Estadísticas de la simulación (véase `play_stats`).
+    """
+    clock = time.perf_counter()
+    start, stop, seed = bounds
+    nets = [_template.decode(g) for g in _shared.genomes[start:stop]]
+    world = make_world(nets, _settings, seed)
+    world.play()
+    _shared.fitness[start:stop] = world.fitness()
+    return play_stats(world, clock)
+
+def play_stats(world, start):
+    """
+    Resume la simulación de un mundo en un proceso.
+    
+    Parámetros
+    ----------
+    world : World
+        Mundo ya simulado.
+        
+    start : float
+        Valor de `time.perf_counter()` al iniciar la tarea.
+        
+    Salida
+    ------
+    stats : dict
+        Diccionario con el identificador del proceso (`pid`), el tiempo de la tarea (`seconds`), los pasos
+        simulados (`steps`) y el número de pájaros (`birds`).
+    """
+    return {'pid': os.getpid(),
+            'seconds': time.perf_counter() - start,
+            'steps': world.steps,
+            'birds': len(world.fitness())}
+
+def island_worker(conn, settings, size, seed):
+    """
+    Proceso de una isla de `Trainer.train_islands`. Guarda su propia población y la evoluciona localmente,
+    recibiendo órdenes por `conn`.
+    
+    Parámetros
+    ----------
+    conn : multiprocess.connection.Connection
+        Extremo de la tubería con el proceso principal.
+        
+    settings : dict
+        Diccionario de configuración.
+        
+    size : int
+        Número de individuos de la isla.
+        
+    seed : int
+        Semilla de `random` y `numpy.random` de la isla. Se usa siempre, pues con `fork` la isla hereda el
+        estado de los generadores del proceso principal, igual al de las otras islas.
+        
+    Notas
+    -----
+    Cada orden es una tupla `(generations, courses, immigrants)`. La isla reemplaza a sus peores individuos
+    con los inmigrantes `(genomes, fitness)` (si hay), se reproduce, y simula `generations` generaciones en un
+    solo mundo, cada una en el recorrido correspondiente de `courses`; entre generaciones se reproduce con
+    `ga.next_generation`. Al terminar responde con `(fitness, genomes, stats)`: el fitness de cada
+    generación, los cromosomas de la última generación simulada (sin reproducir, para que el proceso
+    principal escoja a los emigrantes) y las estadísticas de cada simulación. La orden `None` termina el
+    proceso.
+    """
+    np.random.seed(seed)
+    random.seed(seed)
+    DTYPE = settings.get('DTYPE', float)
+    template = nn.NeuralNet(settings['LAYER_SIZES'], settings['ACTIVATION_FUNCTIONS'],
+                            settings['LAST_ACTIVATION'], flat=settings.get('FLAT_GENOME', False), dtype=DTYPE)
+    genomes = np.stack([nn.NeuralNet(settings['LAYER_SIZES'], settings['ACTIVATION_FUNCTIONS'],
+                                     settings['LAST_ACTIVATION'], dtype=DTYPE).encode() for _ in range(size)])
+    fitness = None
+    while True:
+        order = conn.recv()
+        if order is None:
+            break
+        generations, courses, immigrants = order
+        if fitness is not None: # La población ya se evaluó: recibimos inmigrantes y nos reproducimos
+            if immigrants is not None:
+                worst = np.argsort(fitness)[:len(immigrants[0])]
+                genomes[worst], fitness[worst] = immigrants
+            genomes = ga.next_generation(genomes, fitness, settings)[0]
+        history, stats = [], []
+        for g in range(generations):
+            if g > 0:
+                genomes = ga.next_generation(genomes, fitness, settings)[0]
+            start = time.perf_counter()
+            world = make_world([template.decode(x) for x in genomes], settings, courses[g])
+            world.play()
+            fitness = np.array(world.fitness())
+            history.append(fitness)
+            stats.append(play_stats(world, start))
+        conn.send((np.array(history), genomes, stats))
+    conn.close()
+
+class Dispatcher:
+    """
+    Repartidor de tareas entre procesos trabajadores remotos. Vive en el servidor de un `Coordinator`, y
+    tanto el coordinador como los trabajadores lo usan a través de un proxy de `DispatcherManager`.
+    
+    Parámetros
+    ----------
+    settings : dict
+        Diccionario de configuración que reciben los trabajadores.
+        
+    timeout : float = 10
+        Segundos sin noticias de un trabajador (ni latidos ni resultados) tras los cuales se le considera
+        perdido y sus tareas se reasignan.
+        
+    Atributos
+    ---------
+    pending : collections.deque
+        Identificadores de las tareas por asignar.
+        
+    tasks : dict
+        Tareas de la forma {id: (genomes, course)} que aún no tienen resultado.
+        
+    assigned : dict
+        Trabajador al que se asignó cada tarea, de la forma {id: worker}.
+        
+    results : dict
+        Resultados de la forma {id: (fitness, stats)}.
+        
+    seen : dict
+        Última vez (según `time.monotonic`) que se supo de cada trabajador.
+        
+    finished : set
+        Trabajadores que ya recibieron la orden de terminar.
+        
+    reassigned : int
+        Número de tareas reasignadas por haber perdido a su trabajador.
+        
+    Notas
+    -----
+    El servidor atiende cada conexión en un hilo distinto, así que todos los métodos toman `self.lock`. Si
+    una tarea se reasigna y ambos trabajadores la terminan, se conserva el primer resultado.
+    """
+    def __init__(self, settings, timeout=10):
+        self.settings = settings
+        self.timeout = timeout
+        self.lock = threading.Condition()
+        self.pending = collections.deque()
+        self.tasks = {}
+        self.assigned = {}
+        self.results = {}
+        self.seen = {}
+        self.finished = set()
+        self.next_id = 0
+        self.stopped = False
+        self.reassigned = 0
+        
+    def get_settings(self):
+        return self.settings
+    
+    def heartbeat(self, worker):
+        """
+        Registra que un trabajador sigue vivo. Regresa `True` si debe terminar.
+        """
+        with self.lock:
+            self.seen[worker] = time.monotonic()
+            return self.stopped
+        
+    def get_task(self, worker):
+        """
+        Asigna la siguiente tarea a un trabajador.
+        
+        Salida
+        ------
+        task : tuple
+            Tupla `(id, genomes, course)`, `None` si no hay tareas por ahora, o 'stop' si el trabajador debe
+            terminar.
+        """
+        with self.lock:
+            self.seen[worker] = time.monotonic()
+            if self.stopped:
+                self.finished.add(worker)
+                return 'stop'
+            while self.pending:
+                i = self.pending.popleft()
+                if i in self.tasks: # Puede haberse resuelto después de reasignarse
+                    self.assigned[i] = worker
+                    genomes, course = self.tasks[i]
+                    return i, genomes, course
+            return None
+        
+    def put_result(self, worker, i, result):
+        """
+        Guarda el resultado `(fitness, stats)` de una tarea.
+        """
+        with self.lock:
+            self.seen[worker] = time.monotonic()
+            if i in self.tasks:
+                del self.tasks[i]
+                self.results[i] = result
+            self.assigned.pop(i, None)
+            self.lock.notify_all()
+            
+    def submit(self, tasks):
+        """
+        Agrega tareas `(genomes, course)` y regresa sus identificadores.
+        """
+        with self.lock:
+            ids = list(range(self.next_id, self.next_id + len(tasks)))
+            self.next_id += len(tasks)
+            for i, t in zip(ids, tasks):
+                self.tasks[i] = t
+                self.pending.append(i)
+            return ids
+        
+    def cancel(self, ids):
+        """
+        Descarta las tareas dadas, con o sin resultado.
+        """
+        with self.lock:
+            for i in ids:
+                self.tasks.pop(i, None)
+                self.assigned.pop(i, None)
+                self.results.pop(i, None)
+        
+    def reassign_lost(self):
+        """
+        Vuelve a poner en espera las tareas de los trabajadores de los que no se sabe nada desde hace más de
+        `self.timeout` segundos.
+        """
+        now = time.monotonic()
+        for i, worker in list(self.assigned.items()):
+            if now - self.seen.get(worker, now) > self.timeout:
+                del self.assigned[i]
+                self.pending.appendleft(i)
+                self.reassigned += 1
+                
+    def collect(self, ids, wait=1.0):
+        """
+        Espera hasta `wait` segundos a que terminen las tareas dadas, reasignando las perdidas.
+        
+        Salida
+        ------
+        results : list
+            Resultados de las tareas en el orden de `ids`, o `None` si aún falta alguna.
+        """
+        with self.lock:
+            self.lock.wait_for(lambda: all(i in self.results for i in ids), wait)
+            self.reassign_lost()
+            if not all(i in self.results for i in ids):
+                return None
+            return [self.results.pop(i) for i in ids]
+        
+    def workers(self):
+        """
+        Trabajadores de los que se supo algo en los últimos `self.timeout` segundos.
+        """
+        with self.lock:
+            now = time.monotonic()
+            return [w for w, t in self.seen.items() if now - t <= self.timeout]
+        
+    def running(self):
+        """
+        Trabajadores vivos (véase `workers`) que todavía no reciben la orden de terminar.
+        """
+        with self.lock:
+            now = time.monotonic()
+            return [w for w, t in self.seen.items() if now - t <= self.timeout and w not in self.finished]
+        
+    def stop(self):
+        """
+        Indica a todos los trabajadores que terminen.
+        """
+        with self.lock:
+            self.stopped = True
+
+def init_dispatcher(settings, timeout):
+    """
+    Inicializa el proceso servidor de un `Coordinator` con su repartidor.
+    """
+    global _dispatcher
+    _dispatcher = Dispatcher(settings, timeout)
+    
+def get_dispatcher():
+    return _dispatcher
+
+class DispatcherManager(BaseManager):
+    """
+    Manejador que comparte por TCP el repartidor de tareas (`Dispatcher`) de un `Coordinator`.
+    """
+DispatcherManager.register('dispatcher', callable=get_dispatcher)
+
+class Coordinator:
+    """
+    Coordinador de la evaluación en varias máquinas: abre un servidor TCP al que se conectan procesos
+    trabajadores (véase `run_worker`), les reparte los mundos a simular y recibe su fitness.
+    
+    Parámetros
+    ----------
+    address : tuple
+        Dirección `(host, puerto)` donde escuchar. Con puerto 0 se escoge uno libre; la dirección real queda
+        en `self.address`. Para aceptar otras máquinas hay que escuchar en una interfaz de una red de
+        confianza (véase Notas).
+        
+    settings : dict
+        Diccionario de configuración que reciben los trabajadores.
+        
+    authkey : bytes = None
+        Clave que deben usar los trabajadores para conectarse. Si es `None`, se genera una aleatoria con
+        `os.urandom(32)` y se imprime en hexadecimal, para iniciar a los trabajadores con ella.
+        
+    timeout : float = 10
+        Segundos sin latidos tras los cuales se reasignan las tareas de un trabajador (véase `Dispatcher`), y
+        sin ningún trabajador vivo tras los cuales `starmap` falla.
+        
+    Atributos
+    ---------
+    manager : DispatcherManager
+        Manejador cuyo servidor, en un proceso aparte, guarda el repartidor.
+        
+    dispatcher : multiprocess.managers.BaseProxy
+        Proxy del repartidor de tareas.
+        
+    authkey : bytes
+        Clave del coordinador.
+        
+    Notas
+    -----
+    Las conexiones deserializan sus mensajes con dill, así que quien conozca la clave puede ejecutar código
+    en el coordinador y en los trabajadores. Por eso no hay clave por omisión, y el puerto sólo debe ser
+    accesible desde máquinas de confianza.
+    """
+    def __init__(self, address, settings, authkey=None, timeout=10):
+        if authkey is None:
+            authkey = os.urandom(32)
+            print("Clave del coordinador: {}".format(authkey.hex()))
+        self.manager = DispatcherManager(tuple(address), authkey)
+        self.manager.start(init_dispatcher, (settings, timeout))
+        self.address = self.manager.address
+        self.authkey = authkey
+        self.timeout = timeout
+        self.dispatcher = self.manager.dispatcher()
+        
+    def starmap(self, tasks):
+        """
+        Evalúa mundos en los trabajadores conectados, como `pool.starmap(play_genomes, tasks)`.
+        
+        Parámetros
+        ----------
+        tasks : list
+            Lista de tuplas `(genomes, course)` (véase `play_genomes`).
+            
+        Salida
+        ------
+        results : list
+            Lista con el resultado `(fitness, stats)` de cada tarea, en orden.
+            
+        Notas
+        -----
+        Si durante más de `self.timeout` segundos no hay ningún trabajador vivo (porque nunca se conectó
+        ninguno o porque todos murieron), se descartan las tareas y se lanza `RuntimeError`.
+        """
+        ids = self.dispatcher.submit(tasks)
+        results = None
+        last = time.monotonic() # Última vez que hubo trabajadores
+        while results is None:
+            results = self.dispatcher.collect(ids)
+            now = time.monotonic()
+            if self.dispatcher.workers():
+                last = now
+            elif results is None and now - last > self.timeout:
+                self.dispatcher.cancel(ids)
+                raise RuntimeError("No hay trabajadores conectados a {} desde hace {} segundos"
+                                   .format(self.address, self.timeout))
+        return results
+    
+    def close(self, poll=0.05):
+        """
+        Indica a los trabajadores que terminen y cierra el servidor en cuanto todos recibieron la orden, o
+        dejaron de enviar latidos durante `self.timeout` segundos.
+        """
+        self.dispatcher.stop()
+        while self.dispatcher.running():
+            time.sleep(poll)
+        del self.dispatcher
+        self.manager.shutdown()
+
+def run_worker(address, authkey, heartbeat=1.0, poll=0.05):
+    """
+    Proceso trabajador: se conecta a un `Coordinator`, y simula los mundos que le asigna hasta que el
+    coordinador termina. Se puede ejecutar en otra máquina con
+    
+        python bird_utils.py --worker host:puerto --authkey clave
+        
+    donde `clave` es la clave del coordinador en hexadecimal.
+        
+    Parámetros
+    ----------
+    address : tuple
+        Dirección `(host, puerto)` del coordinador.
+        
+    authkey : bytes
+        Clave del coordinador.
+        
+    heartbeat : float = 1.0
+        Segundos entre cada latido, enviados desde un hilo aparte mientras se simula.
+        
+    poll : float = 0.05
+        Segundos a esperar cuando no hay tareas.
+    """
+    manager = DispatcherManager(tuple(address), authkey)
+    manager.connect()
+    dispatcher = manager.dispatcher()
+    init_worker(dispatcher.get_settings())
+    worker = '{}:{}'.format(socket.gethostname(), os.getpid())
+    done = threading.Event()
+    
+    def beat():
+        while not done.wait(heartbeat):
+            try:
+                if dispatcher.heartbeat(worker):
+                    return
+            except (EOFError, OSError): # El coordinador ya terminó
+                return
+    threading.Thread(target=beat, daemon=True).start()
+    try:
+        while True:
+            task = dispatcher.get_task(worker)
+            if task == 'stop':
+                break
+            if task is None:
+                time.sleep(poll)
+                continue
+            i, genomes, course = task
+            dispatcher.put_result(worker, i, play_genomes(genomes, course))
+    except (EOFError, OSError):
+        pass
+    finally:
+        done.set()
+
+def spawn_workers(address, n, authkey):
+    """
+    Inicia `n` procesos trabajadores en esta máquina, por ejemplo para probar un `Coordinator` en localhost.
+    
+    Salida
+    ------
+    workers : list
+        Lista de objetos `multiprocess.Process`, ya iniciados.
+    """
+    workers = [mp.Process(target=run_worker, args=(address, authkey), daemon=True) for _ in range(n)]
+    for w in workers:
+        w.start()
+    return workers
+
+def activation_names(settings):
+    """
+    Nombres de las funciones de activación de la configuración, en orden
+    entrada -> salida, incluyendo la de la última capa.
+    """
+    functions = list(settings['ACTIVATION_FUNCTIONS']) + [settings['LAST_ACTIVATION']]
+    return [nn.activation_name(f) for f in functions]
+
+def read_checkpoint(path):
+    """
+    Lee un archivo guardado por `Trainer.save_checkpoint`, sin construir las redes.
+    
+    Parámetros
+    ----------
+    path : str
+        Ubicación del archivo.
+        
+    Salida
+    ------
+    data : dict
+        Diccionario con los arreglos guardados. La población está en `data['genomes']`, una matriz con un
+        cromosoma por renglón.
+    """
+    with np.load(path) as data:
+        return dict(data)
+
 def chunks(a, n): # Separa una lista en pedazos de tamaño n
     for i in range(0, len(a), n):
         yield a[i:i + n]
         
-def best_world(birds, settings, n_birds=1):
+def make_world(nets, settings, seed=None, record=False):
+    """
+    Crea un mundo con las redes dadas.
+    
+    Parámetros
+    ----------
+    nets : list
+        Lista de redes de los pájaros del mundo.
+        
+    settings : dict
+        Diccionario de configuración. El tipo de mundo se escoge con
+        `settings['BACKEND']`:
+            - python : `World`, un objeto por pájaro.
+            - numpy : `VectorWorld`, vectorizado con numpy.
+            - numba : `JitWorld`, compilado con Numba. Si Numba no está
+              instalado o alguna activación no tiene equivalente, se usa
+              `VectorWorld`.
+        Si no se da, se usa 'numpy' cuando `settings['VECTORIZED']` es
+        verdadero y 'python' en otro caso. Con `settings['COURSES'] > 1` cada
+        red se evalúa en varios recorridos a la vez (véase `VectorWorld`), lo
+        que 'python' no permite, así que se usa 'numpy' en su lugar.
+        
+    seed : {int, numpy.random.Generator} = None
+        Semilla del recorrido de tuberías.
+        
+    record : bool = False
+        Si el mundo graba su trayectoria (véase `trajectory.Trajectory`).
+        
+    Salida
+    ------
+    world : World
+        Mundo nuevo con un pájaro por red.
+    """
+    BACKEND = settings.get('BACKEND', 'numpy' if settings.get('VECTORIZED', False) else 'python')
+    if BACKEND == 'numba':
+        if fb.JitWorld.supported(settings):
+            return fb.JitWorld(nets, settings, seed, record)
+        warnings.warn("Numba no está instalado o alguna activación no tiene equivalente; se usa VectorWorld")
+        BACKEND = 'numpy'
+    if BACKEND == 'python' and settings.get('COURSES', 1) > 1:
+        BACKEND = 'numpy' # `World` sólo tiene un recorrido
+    if BACKEND == 'numpy':
+        return fb.VectorWorld(nets, settings, seed, record)
+    return fb.World(nets, settings, seed, record)
+        
+def best_world(birds, settings, n_birds=1, seed=None, record=False):
     """
     Genera un mundo con los mejores individuos de una generación.
     
@@ -28,6 +780,14 @@ def best_world(birds, settings, n_birds=1):
     n_birds : int = 1
         Número de pájaros que el nuevo mundo tendrá.
         
+    seed : {int, numpy.random.Generator} = None
+        Semilla del recorrido de tuberías, por ejemplo `Trainer.course` para
+        repetir el recorrido en el que se evaluó la última generación.
+        
+    record : bool = False
+        Si el mundo graba su trayectoria, para guardarla y dibujarla después sin
+        volver a simular (véase `trajectory.Trajectory`).
+        
     Salida
     ------
     final_world : World
@@ -36,7 +796,7 @@ def best_world(birds, settings, n_birds=1):
     fit = [b.fitness for b in birds]
     final_birds = np.array(birds)[np.argsort(fit)[:-n_birds-1:-1]]
     final_networks = [b.network for b in final_birds]
-    final_world = fb.World(final_networks, settings)
+    final_world = make_world(final_networks, settings, seed, record)
     return final_world
         
 class Trainer:
@@ -56,11 +816,244 @@ class Trainer:
     birds : int
         Número de pájaros que tendrá cada mundo. Esto significa que si se crean `p` procesos, habrá un total
         de `p * birds` pájaros simulados. 
+        
+    batch_size : int or str = 'auto'
+        Número de pájaros por mundo (una tarea de la pool) en el método 'new' de `train`. Si es 'auto', se
+        escoge en cada generación con `self.scheduler`.
+        
+    seed : int = None
+        Semilla del entrenamiento. Si se da, en cada generación todos los mundos comparten el mismo recorrido
+        de tuberías, generado a partir de esta semilla, de modo que el entrenamiento es reproducible y el
+        fitness de todos los pájaros es comparable. Si es `None`, cada mundo tiene un recorrido aleatorio.
+
+    profile : bool = False
+        Si registrar el tiempo de cada fase del entrenamiento en `self.profiler`.
+
+    fixed_course : bool = False
+        Si todas las generaciones usan el mismo recorrido de tuberías, el primero generado a partir de la
+        semilla. Sólo tiene efecto si hay semilla.
+
+    cache_size : int = 0
+        Número máximo de fitness a guardar en `self.cache`. Si es cero no se usa caché.
+        
+    address : tuple = None
+        Si se da, los mundos de los métodos 'new' y 'old' no se simulan en una pool local sino en procesos
+        trabajadores, posiblemente en otras máquinas, conectados a un `Coordinator` que escucha en esta
+        dirección `(host, puerto)` (véase `run_worker` y `spawn_workers`). En este caso `processes` es el
+        número esperado de trabajadores.
+        
+    authkey : bytes = None
+        Clave del coordinador. Si es `None`, el coordinador genera una al abrirse (véase `Coordinator`) y
+        queda en `self.authkey`.
+        
+    timeout : float = 10
+        Segundos sin latidos tras los cuales el coordinador reasigna las tareas de un trabajador, y sin
+        ningún trabajador vivo tras los cuales el entrenamiento falla con `RuntimeError`.
+
+    pool : multiprocess.Pool
+        Pool de procesos, creada una sola vez por `open` y reutilizada en todas las generaciones. Es `None`
+        mientras no esté abierta.
+        
+    coordinator : Coordinator
+        Coordinador de los trabajadores remotos, creado por `open` si se dio `address`. Es `None` mientras
+        no esté abierto.
+        
+    shared : SharedPopulation
+        Población en memoria compartida con los procesos de la pool, usada por `run_generation_shared`. Sólo
+        se crea al abrir la pool para el método 'shared'; en otro caso es `None`.
+        
+    rng : numpy.random.Generator
+        Generador de las semillas de los recorridos de cada generación, o `None` si no se dio semilla.
+        
+    course : int
+        Semilla del recorrido de tuberías de la última generación simulada, o `None` si cada mundo tuvo un
+        recorrido aleatorio distinto.
+        
+    scheduler : BatchScheduler
+        Estimador del costo de cada tarea, actualizado por `evaluate`, que escoge el número de pájaros por
+        mundo cuando `batch_size='auto'`.
+        
+    cache : FitnessCache
+        Caché del fitness de cada cromosoma en cada recorrido, consultado por `evaluate` para no volver a
+        simular a los individuos que no cambiaron (élites y normales sin mutar). Es `None` si
+        `cache_size=0`. Sólo sirve si el recorrido se repite, es decir, con `fixed_course=True`.
+        
+    profiler : Profiler
+        Registro del tiempo y del tamaño de los datos de cada fase de cada generación. Se exporta con
+        `profiler.to_json` o `profiler.to_csv`.
+        
+    Notas
+    -----
+    El entrenador se puede usar como manejador de contexto para conservar la misma pool entre varias llamadas
+    a `train`:
+    
+        with Trainer(settings, birds, processes) as trainer:
+            trainer.train(10)
+            trainer.train(10)
     """
-    def __init__(self, settings, birds, processes):
+    def __init__(self, settings, birds, processes, seed=None, profile=False, batch_size='auto',
+                 fixed_course=False, cache_size=0, address=None, authkey=None, timeout=10):
         self.settings = settings
         self.birds = birds
         self.processes = processes
+        self.batch_size = batch_size
+        self.scheduler = BatchScheduler(processes)
+        self.pool = None
+        self.shared = None
+        self.address = address
+        self.authkey = authkey
+        self.timeout = timeout
+        self.coordinator = None
+        self.rng = None if seed is None else np.random.default_rng(seed)
+        self.course = None
+        self.fixed_course = fixed_course
+        self.cache = None
+        if cache_size > 0:
+            self.cache = FitnessCache(cache_size, settings_digest(settings, activation_names(settings)))
+        self.profiler = Profiler(profile)
+        
+    def __enter__(self):
+        self.open()
+        return self
+    
+    def __exit__(self, *args):
+        self.close()
+        
+    def open(self, shared=False):
+        """
+        Crea la pool de procesos si no existe todavía, o el coordinador si se dio `address`.
+        
+        Parámetros
+        ----------
+        shared : bool = False
+            Si los procesos necesitan la población en memoria compartida (método 'shared'). Sólo en ese caso
+            se crea `self.shared`; si la pool ya estaba abierta sin ella, se vuelve a crear.
+            
+        Salida
+        ------
+        pool : {multiprocess.Pool, Coordinator}
+            Pool de procesos o coordinador del entrenador.
+        """
+        if self.address is not None:
+            if self.coordinator is None:
+                with self.profiler.phase('pool_startup', objects=self.processes):
+                    self.coordinator = Coordinator(self.address, self.settings, self.authkey, self.timeout)
+                    self.authkey = self.coordinator.authkey
+            return self.coordinator
+        if shared and self.pool is not None and self.shared is None:
+            self.close() # Los procesos se conectan a la memoria compartida al iniciar
+        if self.pool is None:
+            with self.profiler.phase('pool_startup', objects=self.processes):
+                names = None
+                if shared:
+                    LAYER_SIZES = self.settings['LAYER_SIZES']
+                    genes = sum((a + 1)*b for a, b in zip(LAYER_SIZES, LAYER_SIZES[1:])) # Pesos y bias
+                    self.shared = SharedPopulation(self.birds, genes, dtype=self.settings.get('DTYPE', np.float64))
+                    names = (self.birds, genes, self.shared.names, self.shared.dtype)
+                self.pool = mp.Pool(self.processes, initializer=init_worker, initargs=(self.settings, names))
+        return self.pool
+    
+    def close(self):
+        """
+        Cierra la pool de procesos, si está abierta, y libera la memoria compartida. Si hay coordinador, lo
+        cierra y termina a sus trabajadores.
+        """
+        if self.coordinator is not None:
+            self.coordinator.close()
+            self.coordinator = None
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
+        if self.shared is not None:
+            self.shared.unlink()
+            self.shared = None
+            
+    def next_course(self):
+        """
+        Escoge la semilla del recorrido de la siguiente generación y la guarda en `self.course`.
+        
+        Salida
+        ------
+        course : int
+            Semilla del recorrido, o `None` si el entrenador no tiene semilla. Con `fixed_course=True` siempre
+            es la misma.
+        """
+        if self.fixed_course and self.course is not None:
+            return self.course
+        if self.rng is not None:
+            self.course = int(self.rng.integers(2**32))
+        return self.course
+            
+    def evaluate(self, nets):
+        """
+        Simula un mundo por cada lista de redes en la pool de procesos. Sólo se envían los cromosomas de las
+        redes y sólo se regresa el fitness de cada pájaro.
+        
+        Parámetros
+        ----------
+        nets : list
+            Lista de listas de redes. Cada sub-lista corresponde a un mundo.
+            
+        Salida
+        ------
+        final_birds : list
+            Lista de pájaros con su red y su fitness, en el mismo orden que `nets`.
+            
+        Notas
+        -----
+        Si hay caché y el recorrido es determinista, las redes cuyo fitness ya está en `self.cache` no se
+        envían, y los mundos que se quedan sin pájaros no se simulan.
+        """
+        pool = self.open()
+        profiler = self.profiler
+        course = self.next_course()
+        cache = self.cache if course is not None else None
+        with profiler.phase('send', objects=len(nets)) as record:
+            encoded = [[n.encode() for n in group] for group in nets]
+            known = {} # Fitness de las redes encontradas en el caché, por posición
+            keys = {}  # Llaves de las redes a simular, por posición
+            if cache is not None:
+                for i, group in enumerate(encoded):
+                    for j, g in enumerate(group):
+                        key = cache.key(g, course)
+                        f = cache.get(key)
+                        if f is None:
+                            keys[i, j] = key
+                        else:
+                            known[i, j] = f
+            tasks = [(i, [g for j, g in enumerate(group) if (i, j) not in known])
+                     for i, group in enumerate(encoded)]
+            tasks = [(i, group) for i, group in tasks if group] # Mundos con algo que simular
+            genomes = [(group, course) for _, group in tasks]
+            if profiler.enabled:
+                record['bytes'] = profiler.size(genomes)
+                record['cached'] = len(known)
+        with profiler.phase('simulate', objects=len(genomes)):
+            start = time.perf_counter()
+            if self.coordinator is not None:
+                results = self.coordinator.starmap(genomes)
+            else:
+                results = pool.starmap(play_genomes, genomes, chunksize=1) # Cada mundo ya es un lote
+            self.scheduler.update(time.perf_counter() - start, [stats for _, stats in results])
+        with profiler.phase('receive', objects=len(results)) as record:
+            if profiler.enabled:
+                record['bytes'] = profiler.size(results)
+            simulated = {}
+            for (i, _), (fit, stats) in zip(tasks, results):
+                profiler.add('worker', **stats)
+                missing = (j for j in range(len(nets[i])) if (i, j) not in known)
+                for j, f in zip(missing, fit):
+                    simulated[i, j] = f
+                    if cache is not None:
+                        cache.put(keys[i, j], f)
+            final_birds = []
+            for i, group in enumerate(nets):
+                for j, n in enumerate(group):
+                    b = fb.Bird(n, self.settings)
+                    b.fitness = known[i, j] if (i, j) in known else simulated[i, j]
+                    final_birds.append(b)
+        return final_birds
         
     def random_nets(self):
         """
@@ -74,8 +1067,10 @@ class Trainer:
         LAYER_SIZES = self.settings['LAYER_SIZES']
         ACTIVATION_FUNCTIONS = self.settings['ACTIVATION_FUNCTIONS']
         LAST_ACTIVATION = self.settings['LAST_ACTIVATION']
+        FLAT_GENOME = self.settings.get('FLAT_GENOME', False)
+        DTYPE = self.settings.get('DTYPE', float)
         tot = int(self.birds//self.processes)
-        return [nn.NeuralNet(LAYER_SIZES, ACTIVATION_FUNCTIONS, LAST_ACTIVATION) 
+        return [nn.NeuralNet(LAYER_SIZES, ACTIVATION_FUNCTIONS, LAST_ACTIVATION, flat=FLAT_GENOME, dtype=DTYPE) 
                 for _ in range(tot)]
     
     def run_generation(self, nets=None):
@@ -95,14 +1090,12 @@ class Trainer:
         LAYER_SIZES = self.settings['LAYER_SIZES']
         ACTIVATION_FUNCTIONS = self.settings['ACTIVATION_FUNCTIONS']
         LAST_ACTIVATION = self.settings['LAST_ACTIVATION']
+        FLAT_GENOME = self.settings.get('FLAT_GENOME', False)
+        DTYPE = self.settings.get('DTYPE', float)
         if nets is None:
-            nets = [[nn.NeuralNet(LAYER_SIZES, ACTIVATION_FUNCTIONS, LAST_ACTIVATION)] for _ in range(self.birds)]
-        worlds = [fb.World(n, self.settings) for n in nets]
-        pool = mp.Pool(self.processes)
-        birds_split = pool.map(wrapper, worlds)
-        pool.close()
-        final_birds = [b for birds in birds_split for b in birds]
-        return final_birds
+            nets = self.split_nets([[nn.NeuralNet(LAYER_SIZES, ACTIVATION_FUNCTIONS, LAST_ACTIVATION,
+                                                  flat=FLAT_GENOME, dtype=DTYPE) for _ in range(self.birds)], [], []])
+        return self.evaluate(nets)
     
     def run_generation_old(self, nets=None):
         LAYER_SIZES = self.settings['LAYER_SIZES']
@@ -111,30 +1104,168 @@ class Trainer:
         
         if nets is None:
             nets = [self.random_nets() for _ in range(self.processes)]
-        worlds = [fb.World(n, self.settings) for n in nets]
-        pool = mp.Pool(self.processes)
-        birds_split = pool.map(wrapper, worlds)
-        pool.close()
-        final_birds = [b for birds in birds_split for b in birds]
+        return self.evaluate(nets)
+
+    def run_generation_shared(self, nets=None):
+        """
+        Ejecuta una generación de pájaros de manera concurrente a través de memoria compartida. Los
+        cromosomas se copian a `self.shared` y cada proceso recibe sólo un rango de índices, lee los
+        cromosomas ahí mismo y escribe ahí el fitness.
+        
+        Parámetros
+        ----------
+        nets : list = None
+            Lista de `self.birds` redes a usar para los pájaros. Si es `None`, se generan redes aleatorias.
+            
+        Salida
+        ------
+        final_birds : list
+            Lista de pájaros correspondientes a la última generación.
+        """
+        if nets is None:
+            nets = [n for _ in range(self.processes) for n in self.random_nets()]
+        pool = self.open(shared=True)
+        profiler = self.profiler
+        with profiler.phase('send', objects=len(nets)) as record:
+            for i, n in enumerate(nets):
+                self.shared.genomes[i] = n.encode()
+            bounds = np.linspace(0, len(nets), self.processes + 1).astype(int)
+            course = self.next_course()
+            tasks = [(a, b, course) for a, b in zip(bounds[:-1], bounds[1:])]
+            if profiler.enabled:
+                record['bytes'] = profiler.size(tasks)
+        with profiler.phase('simulate', objects=len(tasks)):
+            results = pool.map(play_range, tasks)
+        with profiler.phase('receive', objects=len(results)) as record:
+            if profiler.enabled:
+                record['bytes'] = profiler.size(results)
+            for stats in results:
+                profiler.add('worker', **stats)
+            final_birds = []
+            for n, f in zip(nets, self.shared.fitness):
+                b = fb.Bird(n, self.settings)
+                b.fitness = float(f)
+                final_birds.append(b)
         return final_birds
 
-    def split_nets(self, gens):
+    def save_checkpoint(self, path, nets, generation, fit, method):
         """
-        Divide las redes de una nueva generación en partes iguales para asignarlas a cada proceso.
+        Guarda el estado del entrenamiento en un archivo binario `.npz`, del cual se puede continuar
+        exactamente con `train(resume=path)`.
         
         Parámetros
         ----------
+        path : str
+            Ubicación del archivo. Si no termina en `.npz`, numpy agrega la extensión.
+            
         nets : list
-            Lista de redes a distribuir
+            Redes de la siguiente generación, con la misma estructura que recibe el método de `train`.
+            
+        generation : int
+            Índice de la siguiente generación.
+            
+        fit : list
+            Historia de los fitness de las generaciones anteriores.
+            
+        method : str
+            Método de `train` con el que se generaron las redes.
+            
+        Notas
+        -----
+        El archivo contiene la matriz de cromosomas de la población, la topología y los nombres de las
+        funciones de activación, la historia de fitness y el estado de los generadores aleatorios (`random`,
+        `numpy.random` y el de los recorridos del entrenador).
+        """
+        if method == 'shared':
+            flat, sizes = nets, []
+        else:
+            flat, sizes = [n for group in nets for n in group], [len(group) for group in nets]
+        np_state = np.random.get_state()
+        py_state = random.getstate()
+        np.savez(path,
+                 genomes=np.stack([n.encode() for n in flat]),
+                 sizes=np.array(sizes, dtype=np.int64),
+                 layer_sizes=np.array(self.settings['LAYER_SIZES']),
+                 activations=np.array(activation_names(self.settings)),
+                 generation=generation,
+                 method=method,
+                 fitness=np.array(fit, dtype=float).reshape(len(fit), -1), # Con NaN si la población cambió
+                 np_state=np.array(np_state[1]),
+                 np_state_extra=np.array(np_state[2:], dtype=float),
+                 py_state=np.array((py_state[0],) + py_state[1]),
+                 py_gauss=np.nan if py_state[2] is None else py_state[2],
+                 trainer_rng='' if self.rng is None else json.dumps(self.rng.bit_generator.state),
+                 course=-1 if self.course is None else self.course)
+        
+    def load_checkpoint(self, path):
+        """
+        Lee un archivo guardado por `save_checkpoint` y restaura el estado de los generadores aleatorios.
+        
+        Parámetros
+        ----------
+        path : str
+            Ubicación del archivo.
+            
+        Salida
+        ------
+        out : tuple
+            Tupla de la forma (nets, generation, fit, method), con los mismos significados que en
+            `save_checkpoint`.
+        """
+        LAYER_SIZES = self.settings['LAYER_SIZES']
+        ACTIVATION_FUNCTIONS = self.settings['ACTIVATION_FUNCTIONS']
+        LAST_ACTIVATION = self.settings['LAST_ACTIVATION']
+        FLAT_GENOME = self.settings.get('FLAT_GENOME', False)
+        DTYPE = self.settings.get('DTYPE', float)
+        data = read_checkpoint(path)
+        if list(data['layer_sizes']) != list(LAYER_SIZES) \
+        or list(data['activations']) != activation_names(self.settings):
+            raise ValueError("El checkpoint no corresponde a la topología de la configuración")
+        
+        template = nn.NeuralNet(LAYER_SIZES, ACTIVATION_FUNCTIONS, LAST_ACTIVATION, flat=FLAT_GENOME, dtype=DTYPE)
+        flat = [template.decode(g) for g in data['genomes'].astype(DTYPE, copy=False)]
+        method = str(data['method'])
+        if method == 'shared':
+            nets = flat
+        else:
+            bounds = np.cumsum(np.concatenate([[0], data['sizes']]))
+            nets = [flat[a:b] for a, b in zip(bounds[:-1], bounds[1:])]
+        fit = data['fitness'].tolist()
+        generation = int(data['generation'])
+        
+        pos, has_gauss, cached = data['np_state_extra']
+        np.random.set_state(('MT19937', data['np_state'], int(pos), int(has_gauss), cached))
+        py_gauss = float(data['py_gauss'])
+        py_state = data['py_state'].tolist()
+        random.setstate((py_state[0], tuple(py_state[1:]), None if np.isnan(py_gauss) else py_gauss))
+        if str(data['trainer_rng']):
+            self.rng = np.random.default_rng()
+            self.rng.bit_generator.state = json.loads(str(data['trainer_rng']))
+        course = int(data['course'])
+        self.course = None if course < 0 else course
+        return nets, generation, fit, method
+
+    def split_nets(self, gens):
+        """
+        Divide las redes de una nueva generación en mundos de `self.batch_size` pájaros, o del tamaño que
+        escoja `self.scheduler` si `self.batch_size='auto'`.
+        
+        Parámetros
+        ----------
+        gens : tuple
+            Tupla de la forma (e, h, n) con las redes élite, hijas y normales (véase `ga.new_generation`).
         
         Salida
         ------
         final_nets : list
-            Lista de listas de tamaño `self.processes`, con la misma proporción de pájaros élite, hijos y normales.
-            Cada sub-lista contiene `self.birds` redes.
+            Lista de listas de redes. Cada sub-lista es un mundo, y al concatenarlas se recuperan las redes en
+            el orden original.
         """
         final_nets = gens[0] + gens[1] + gens[2]
-        return [[n] for n in final_nets]
+        size = self.batch_size
+        if size == 'auto':
+            size = self.scheduler.batch_size(len(final_nets))
+        return list(chunks(final_nets, size))
     
     def split_nets_old(self, gens):
         elites = list(chunks(gens[0], len(gens[0])//self.processes))
@@ -142,7 +1273,8 @@ class Trainer:
         normals = list(chunks(gens[2], len(gens[2])//self.processes))
         return [elites[i] + children[i] + normals[i] for i in range(self.processes)]
 
-    def train(self, generations, max_fitness=None, verbose=False, method='new'):
+    def train(self, generations, max_fitness=None, verbose=False, method='new',
+              checkpoint=None, checkpoint_every=1, resume=None, history_path=None):
         """
         Crea una población nueva de pájaros y los entrena.
         
@@ -150,29 +1282,386 @@ class Trainer:
         ----------
         generations : int
             Número de generaciones a simular
+            
+        max_fitness : float = None
+            Si el fitness promedio de una generación lo supera, se detiene el entrenamiento.
+            
+        verbose : bool = False
+            Si imprimir el fitness promedio de cada generación.
+            
+        method : str = 'new'
+            Forma de repartir los pájaros entre los procesos.
+                - new : Mundos de `self.batch_size` pájaros, o de un tamaño adaptativo (véase `BatchScheduler`).
+                - old : Un mundo por proceso.
+                - shared : Un mundo por proceso, con los cromosomas y el fitness en memoria compartida.
+                
+        checkpoint : str = None
+            Ubicación donde guardar un checkpoint del entrenamiento (véase `save_checkpoint`). Se
+            sobreescribe cada `checkpoint_every` generaciones.
+            
+        checkpoint_every : int = 1
+            Cada cuántas generaciones guardar el checkpoint.
+            
+        resume : str = None
+            Checkpoint desde el cual continuar. El entrenamiento sigue en la generación guardada, con la
+            misma población, historia y estado aleatorio, hasta completar `generations` generaciones en total.
+            El método guardado reemplaza a `method`. Si el checkpoint ya tiene `generations` generaciones o
+            más, se lanza `ValueError`.
+            
+        history_path : str = None
+            Si se da, la historia de fitness se guarda en este archivo `.npy` mapeado a memoria en lugar de
+            en memoria RAM (véase `FitnessHistory`).
         
         Salida
         ------
         out : tuple
             Tupla de dos elementos. El primero contiene la última población simulada, y el segundo
-            una historia de los fitness de cada individuo para cada generación.
-        """
-        nets = None
-        fit = []
-        for i in range(generations):           
-            if method == 'new':
-                birds = self.run_generation(nets)
-            elif method == 'old':
-                birds = self.run_generation_old(nets)
-            fit.append([b.fitness for b in birds])
-            avg = np.mean(fit[-1])
-            if max_fitness is not None and avg > max_fitness:
-                return birds, fit
-            nets_bundled = ga.new_generation(birds, self.settings)
-            if method == 'new':
-                nets = self.split_nets(nets_bundled)
-            elif method == 'old':
-                nets = self.split_nets_old(nets_bundled)
-            if verbose:
-                print("Generation: {} Average fitness: {}".format(i, avg), end='\r')
+            una historia de los fitness de cada individuo para cada generación, como un objeto
+            `FitnessHistory` con las estadísticas de cada generación.
+            
+        Notas
+        -----
+        Si la pool no está abierta, se abre al inicio y se cierra al final del entrenamiento, de modo que todas
+        las generaciones usan los mismos procesos.
+        
+        Continuar desde un checkpoint da exactamente los mismos resultados que no haberse detenido siempre que el
+        entrenador tenga semilla, pues de otra forma los recorridos de tuberías son aleatorios.
+        """
+        if self.address is not None and method == 'shared':
+            raise ValueError("El método 'shared' no está disponible con trabajadores remotos")
+        if resume is not None:
+            with np.load(resume) as data:
+                saved = int(data['generation'])
+            if saved >= generations:
+                raise ValueError("El checkpoint ya tiene {} generaciones; `generations` debe ser mayor"
+                                 .format(saved))
+        opened = self.pool is None and self.coordinator is None
+        profiler = self.profiler
+        self.open(shared=method == 'shared')
+        try:
+            nets = None
+            birds = None
+            start = 0
+            history = []
+            if resume is not None:
+                nets, start, history, method = self.load_checkpoint(resume)
+            population = self.birds if method == 'new' else self.processes * (self.birds//self.processes)
+            fit = FitnessHistory(population, generations, history_path)
+            for row in history:
+                fit.append(row)
+            for i in range(start, generations):           
+                profiler.generation = i
+                if method == 'new':
+                    birds = self.run_generation(nets)
+                elif method == 'old':
+                    birds = self.run_generation_old(nets)
+                elif method == 'shared':
+                    birds = self.run_generation_shared(nets)
+                fit.append([b.fitness for b in birds])
+                avg = fit.summary('mean')[-1]
+                if max_fitness is not None and avg > max_fitness:
+                    return birds, fit
+                nets_bundled = ga.new_generation(birds, self.settings, profiler)
+                with profiler.phase('split_nets', objects=len(birds)):
+                    if method == 'new':
+                        nets = self.split_nets(nets_bundled)
+                    elif method == 'old':
+                        nets = self.split_nets_old(nets_bundled)
+                    elif method == 'shared':
+                        nets = nets_bundled[0] + nets_bundled[1] + nets_bundled[2]
+                if checkpoint is not None and (i + 1) % checkpoint_every == 0:
+                    with profiler.phase('checkpoint', objects=len(birds)):
+                        self.save_checkpoint(checkpoint, nets, i + 1, fit, method)
+                if verbose:
+                    print("Generation: {} Average fitness: {}".format(i, avg), end='\r')
+            return birds, fit
+        finally:
+            if birds is not None:
+                fit.flush()
+            if opened:
+                self.close()
+
+    def train_steady(self, evaluations, in_flight=None, max_fitness=None, verbose=False):
+        """
+        Entrena una población con un algoritmo genético de estado estacionario, sin esperar a que termine una
+        generación completa.
+        
+        Parámetros
+        ----------
+        evaluations : int
+            Número total de evaluaciones (simulaciones de un pájaro) a realizar.
+            
+        in_flight : int = None
+            Número de evaluaciones en curso a la vez. Por omisión es `2 * self.processes`, para que ningún
+            proceso se quede sin trabajo.
+            
+        max_fitness : float = None
+            Si el fitness promedio de la población lo supera, se detiene el entrenamiento.
+            
+        verbose : bool = False
+            Si imprimir el fitness promedio de la población cada `self.birds` evaluaciones.
+            
+        Salida
+        ------
+        out : tuple
+            Tupla de dos elementos. El primero contiene la población final, y el segundo una historia
+            (`FitnessHistory`) con el fitness de la población cada `self.birds` evaluaciones. Los individuos
+            que todavía no se han evaluado cuentan con fitness cero.
+            
+        Notas
+        -----
+        La población tiene `self.birds` individuos, al menos 2 para poder cruzarlos. En cuanto termina una
+        evaluación, su fitness entra a la población: si es un individuo inicial ocupa su lugar, y si es un
+        hijo reemplaza al peor individuo siempre que no sea peor que él. Inmediatamente se cruza un hijo nuevo con los operadores de selección,
+        crossover y mutación de `genetic_algorithm` sobre los individuos ya evaluados, y se envía a la pool.
+        Así, los procesos nunca esperan a que termine el pájaro que más vive de una generación.
+        
+        Como un hijo se compara con individuos evaluados antes que él, todas las evaluaciones usan un solo
+        recorrido de tuberías, aunque `fixed_course=False`: el de `self.next_course()` o, si el entrenador no
+        tiene semilla, uno escogido con `numpy.random`. Así el reemplazo depende del individuo y no de la
+        dificultad del recorrido.
+        """
+        LAYER_SIZES = self.settings['LAYER_SIZES']
+        ACTIVATION_FUNCTIONS = self.settings['ACTIVATION_FUNCTIONS']
+        LAST_ACTIVATION = self.settings['LAST_ACTIVATION']
+        FLAT_GENOME = self.settings.get('FLAT_GENOME', False)
+        MUTATION = self.settings['MUTATION']
+        SELECTION = self.settings['SELECTION']
+        CONTESTANTS = self.settings['CONTESTANTS']
+        CROSSOVER_METHOD = self.settings.get('CROSSOVER_METHOD', 'one_point')
+        DTYPE = self.settings.get('DTYPE', float)
+        if in_flight is None:
+            in_flight = 2*self.processes
+        if self.birds < 2 or in_flight < 1: # De otra forma nunca habría evaluaciones en curso que esperar
+            raise ValueError("Se necesitan al menos 2 pájaros y 1 evaluación en curso")
+        
+        template = nn.NeuralNet(LAYER_SIZES, ACTIVATION_FUNCTIONS, LAST_ACTIVATION, flat=FLAT_GENOME, dtype=DTYPE)
+        genomes = np.stack([template.encode().copy()] + 
+                           [nn.NeuralNet(LAYER_SIZES, ACTIVATION_FUNCTIONS, LAST_ACTIVATION, dtype=DTYPE).encode()
+                            for _ in range(self.birds - 1)])
+        fitness = np.full(self.birds, np.nan) # NaN: todavía no se evalúa
+        fit = FitnessHistory(self.birds, evaluations//self.birds + 1)
+        done = queue.Queue() # Evaluaciones terminadas, llenada por la pool
+        
+        def breed():
+            evaluated = np.flatnonzero(~np.isnan(fitness))
+            if SELECTION == 'roulette':
+                parents = ga.roulette_indices(fitness[evaluated], 1)
+            elif SELECTION == 'tournament':
+                parents = ga.tournament_indices(fitness[evaluated], 1, CONTESTANTS)
+            parents = evaluated[parents[0]]
+            child = ga.crossover_batch(genomes[parents[:1]], genomes[parents[1:]], CROSSOVER_METHOD)[:1]
+            ga.mutate(child, MUTATION)
+            return child[0]
+        
+        if self.address is not None:
+            raise ValueError("El entrenamiento de estado estacionario no está disponible con trabajadores remotos")
+        opened = self.pool is None
+        pool = self.open()
+        try:
+            course = self.next_course() # Un solo recorrido para que los fitness sean comparables
+            if course is None:
+                course = int(np.random.randint(2**32))
+            initial = 0 # Siguiente individuo inicial por evaluar
+            pending = 0
+            completed = 0
+            while completed < evaluations:
+                # Llenamos la pool
+                while pending < in_flight and completed + pending < evaluations:
+                    if initial < self.birds:
+                        slot, genome = initial, None
+                        initial += 1
+                    elif np.count_nonzero(~np.isnan(fitness)) >= 2:
+                        slot, genome = None, breed()
+                    else: # Esperamos a tener padres
+                        break
+                    task = genomes[slot] if genome is None else genome
+                    pool.apply_async(play_genomes, ([task], course),
+                                     callback=lambda r, s=slot, g=genome: done.put((s, g, r)),
+                                     error_callback=lambda e: done.put((None, None, e)))
+                    pending += 1
+                
+                slot, genome, result = done.get()
+                if isinstance(result, BaseException):
+                    raise result
+                pending -= 1
+                completed += 1
+                value = result[0][0]
+                self.profiler.add('worker', **result[1])
+                if genome is None: # Individuo inicial
+                    fitness[slot] = value
+                else: # Hijo: reemplaza al peor individuo evaluado
+                    evaluated = np.flatnonzero(~np.isnan(fitness))
+                    worst = evaluated[np.argmin(fitness[evaluated])]
+                    if value >= fitness[worst]:
+                        genomes[worst] = genome
+                        fitness[worst] = value
+                
+                if completed % self.birds == 0:
+                    fit.append(np.nan_to_num(fitness))
+                    avg = fit.summary('mean')[-1]
+                    if verbose:
+                        print("Evaluations: {} Average fitness: {}".format(completed, avg), end='\r')
+                    if max_fitness is not None and avg > max_fitness:
+                        break
+        finally:
+            if opened:
+                self.close()
+        
+        birds = []
+        for g, f in zip(genomes, np.nan_to_num(fitness)):
+            b = fb.Bird(template.decode(g), self.settings)
+            b.fitness = float(f)
+            birds.append(b)
+        return birds, fit
+
+    def train_islands(self, generations, interval=5, migrants=2, topology='ring', islands=None,
+                      max_fitness=None, verbose=False):
+        """
+        Entrena con un modelo de islas: cada isla es un proceso que guarda su propia población y hace la
+        selección, el crossover y la mutación localmente. Cada `interval` generaciones los mejores individuos
+        de cada isla migran a otras.
+        
+        Parámetros
+        ----------
+        generations : int
+            Número de generaciones a simular.
+            
+        interval : int = 5
+            Número de generaciones entre migraciones.
+            
+        migrants : int = 2
+            Número de individuos que cada isla envía en cada migración. Son sus mejores individuos, y
+            reemplazan a los peores de la isla que los recibe.
+            
+        topology : str = 'ring'
+            A qué islas migran los individuos.
+                - ring : De la isla `i` a la `i+1`, en un anillo.
+                - random : De cada isla a otra escogida al azar en cada migración.
+                - full : De cada isla a todas las demás.
+                
+        islands : int = None
+            Número de islas. Por omisión es `self.processes`. Cada una tiene `self.birds // islands` pájaros.
+            
+        max_fitness : float = None
+            Si el fitness promedio de una generación lo supera, se detiene el entrenamiento al terminar el
+            intervalo.
+            
+        verbose : bool = False
+            Si imprimir el fitness promedio después de cada migración.
+            
+        Salida
+        ------
+        out : tuple
+            Tupla de dos elementos, como en `train`. El primero contiene la última población simulada de todas
+            las islas, en orden, y el segundo la historia de fitness (`FitnessHistory`) de todas las islas.
+            
+        Notas
+        -----
+        Las islas no usan la pool: cada una es un proceso persistente (véase `island_worker`), y el proceso
+        principal sólo intercambia con ellas los recorridos, los emigrantes y el fitness de cada generación,
+        una vez por intervalo. Todas las islas usan el mismo recorrido en cada generación, de modo que el
+        fitness de los inmigrantes es comparable con el de la isla que los recibe.
+        
+        Cada isla recibe su propia semilla: del generador del entrenador si tiene semilla, o de la entropía
+        del sistema si no. En este último caso los recorridos de cada generación también salen de la entropía
+        del sistema, pero son los mismos para todas las islas.
+        """
+        LAYER_SIZES = self.settings['LAYER_SIZES']
+        if islands is None:
+            islands = self.processes
+        size = self.birds // islands
+        profiler = self.profiler
+        if self.rng is None: # Semillas distintas aunque se haya fijado la de numpy.random
+            entropy = np.random.SeedSequence()
+            seeds = [int(s.generate_state(1)[0]) for s in entropy.spawn(islands)]
+        else:
+            seeds = [int(s) for s in self.rng.integers(2**32, size=islands)]
+        fit = FitnessHistory(size*islands, generations)
+        
+        with profiler.phase('pool_startup', objects=islands):
+            conns, workers = [], []
+            for i in range(islands):
+                parent, child = mp.Pipe()
+                w = mp.Process(target=island_worker, args=(child, self.settings, size, seeds[i]), daemon=True)
+                w.start()
+                conns.append(parent)
+                workers.append(w)
+        try:
+            immigrants = [None]*islands
+            done = 0
+            while done < generations:
+                n = min(interval, generations - done)
+                profiler.generation = done
+                if self.rng is None: # Recorridos aleatorios, pero iguales en todas las islas
+                    courses = [int(s.generate_state(1)[0]) for s in entropy.spawn(n)]
+                else:
+                    courses = [self.next_course() for _ in range(n)]
+                with profiler.phase('evolve', objects=islands):
+                    for c, imm in zip(conns, immigrants):
+                        c.send((n, courses, imm))
+                    results = [c.recv() for c in conns]
+                for _, _, stats in results:
+                    for s in stats:
+                        profiler.add('worker', **s)
+                for g in range(n):
+                    fit.append(np.concatenate([history[g] for history, _, _ in results]))
+                done += n
+                
+                with profiler.phase('migrate', objects=islands*migrants):
+                    best = [] # Emigrantes de cada isla
+                    for history, genomes, _ in results:
+                        top = np.argsort(history[-1])[::-1][:migrants]
+                        best.append((genomes[top], history[-1][top]))
+                    if topology == 'ring':
+                        sources = [[(i - 1) % islands] for i in range(islands)]
+                    elif topology == 'random':
+                        targets = [(i + np.random.randint(1, islands)) % islands if islands > 1 else i
+                                   for i in range(islands)]
+                        sources = [[j for j in range(islands) if targets[j] == i] for i in range(islands)]
+                    elif topology == 'full':
+                        sources = [[j for j in range(islands) if j != i] for i in range(islands)]
+                    else:
+                        raise ValueError("Topología desconocida: {}".format(topology))
+                    immigrants = []
+                    for i, s in enumerate(sources):
+                        s = [j for j in s if j != i] # Con una sola isla no hay migración
+                        if s:
+                            immigrants.append((np.concatenate([best[j][0] for j in s])[:size],
+                                               np.concatenate([best[j][1] for j in s])[:size]))
+                        else:
+                            immigrants.append(None)
+                    
+                avg = fit.summary('mean')[-1]
+                if verbose:
+                    print("Generation: {} Average fitness: {}".format(done - 1, avg), end='\r')
+                if max_fitness is not None and avg > max_fitness:
+                    break
+        finally:
+            for c in conns:
+                c.send(None)
+            for w in workers:
+                w.join()
+        
+        template = nn.NeuralNet(LAYER_SIZES, self.settings['ACTIVATION_FUNCTIONS'],
+                                self.settings['LAST_ACTIVATION'], flat=self.settings.get('FLAT_GENOME', False),
+                                dtype=self.settings.get('DTYPE', float))
+        birds = []
+        for history, genomes, _ in results:
+            for g, f in zip(genomes, history[-1]):
+                b = fb.Bird(template.decode(g), self.settings)
+                b.fitness = float(f)
+                birds.append(b)
         return birds, fit
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description="Trabajador remoto de un `Coordinator`.")
+    parser.add_argument('--worker', required=True, metavar='HOST:PUERTO', help="Dirección del coordinador.")
+    parser.add_argument('--authkey', required=True, help="Clave del coordinador, en hexadecimal.")
+    parser.add_argument('--processes', type=int, default=1, help="Número de trabajadores a iniciar.")
+    args = parser.parse_args()
+    host, port = args.worker.rsplit(':', 1)
+    address = (host, int(port))
+    for w in spawn_workers(address, args.processes, bytes.fromhex(args.authkey)):
+        w.join()
@@ -0,0 +1,104 @@
+"""
+Este archivo implementa un caché de fitness, para no volver a simular a los
+individuos que ya se evaluaron en el mismo recorrido.
+"""
+
+import hashlib
+import json
+
+from collections import OrderedDict
+
+import numpy as np
+
+def settings_digest(settings, names=()):
+    """
+    Resume en bytes los parámetros de la configuración que afectan el fitness.
+
+    Parámetros
+    ----------
+    settings : dict
+        Diccionario de configuración. Se usan los parámetros numéricos y de
+        texto, y la topología de la red.
+
+    names : list = ()
+        Nombres de las funciones de activación, que no se pueden comparar
+        directamente.
+
+    Salida
+    ------
+    digest : bytes
+        Resumen de la configuración.
+    """
+    values = {k: v for k, v in settings.items()
+              if not callable(v) and not (isinstance(v, list) and any(map(callable, v)))}
+    values['ACTIVATIONS'] = list(names)
+    text = json.dumps(values, sort_keys=True, default=str)
+    return hashlib.blake2b(text.encode(), digest_size=16).digest()
+
+class FitnessCache:
+    """
+    Caché de tamaño acotado que guarda el fitness de cada cromosoma en cada
+    recorrido, y descarta el usado hace más tiempo cuando se llena.
+
+    Parámetros
+    ----------
+    maxsize : int
+        Número máximo de fitness guardados.
+
+    salt : bytes = b''
+        Bytes que se agregan a cada llave, por ejemplo `settings_digest` de la
+        configuración, para que dos configuraciones distintas no compartan
+        fitness.
+
+    Atributos
+    ---------
+    hits, misses : int
+        Número de consultas encontradas y no encontradas en el caché.
+
+    Notas
+    -----
+    La llave de cada individuo es un hash `blake2b` de los bytes de su
+    cromosoma, la semilla del recorrido y `salt`. Sólo tiene sentido cuando el
+    recorrido es determinista, es decir, cuando hay semilla: si `course` es
+    `None` no se guarda ni se consulta nada.
+    """
+    def __init__(self, maxsize, salt=b''):
+        self.maxsize = maxsize
+        self.salt = salt
+        self.data = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, genome, course):
+        """
+        Llave de un cromosoma en un recorrido.
+        """
+        h = hashlib.blake2b(np.ascontiguousarray(genome).tobytes(), digest_size=16)
+        h.update(int(course).to_bytes(8, 'little'))
+        h.update(self.salt)
+        return h.digest()
+
+    def get(self, key):
+        """
+        Regresa el fitness de una llave, o `None` si no está en el caché.
+        """
+        value = self.data.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.data.move_to_end(key) # Usado recientemente
+        return value
+
+    def put(self, key, fitness):
+        """
+        Guarda el fitness de una llave, descartando el usado hace más tiempo si
+        el caché está lleno.
+        """
+        self.data[key] = fitness
+        self.data.move_to_end(key)
+        while len(self.data) > self.maxsize:
+            self.data.popitem(last=False)
+
+    def __len__(self):
+        return len(self.data)
@@ -0,0 +1,171 @@
+"""
+Este archivo implementa una historia de fitness compacta, que guarda el
+fitness de cada individuo de cada generación en un arreglo columnar y calcula
+estadísticas de cada generación conforme se agregan.
+"""
+
+import os
+
+import numpy as np
+
+class FitnessHistory:
+    """
+    Clase que guarda el fitness de cada individuo para cada generación.
+
+    Parámetros
+    ----------
+    population : int
+        Número máximo de individuos por generación. Las generaciones con menos
+        individuos se completan con NaN.
+
+    generations : int = 16
+        Número de generaciones para las que se reserva espacio al inicio. Si se
+        agregan más, el arreglo crece al doble.
+
+    path : str = None
+        Si se da, el arreglo se guarda en un archivo `.npy` mapeado a memoria,
+        de modo que la historia no ocupa memoria RAM y se puede leer con
+        `numpy.load(path, mmap_mode='r')`. Sólo las filas `[:len(self)]` son
+        válidas.
+
+    dtype : numpy.dtype = numpy.float32
+        Tipo de dato del arreglo.
+
+    percentiles : tuple = (10, 50, 90)
+        Percentiles a calcular para cada generación.
+
+    Atributos
+    ---------
+    data : numpy.array
+        Arreglo de la forma `capacidad x population`. El renglón `i` es el
+        fitness de la i-ésima generación, completado con NaN si tuvo menos de
+        `population` individuos.
+
+    stats : numpy.array
+        Arreglo de la forma `capacidad x k` con las estadísticas de cada
+        generación, en el orden de `self.columns`.
+
+    columns : list
+        Nombres de las estadísticas: 'mean', 'std', 'min', 'max' y 'pX' por
+        cada percentil X.
+
+    Notas
+    -----
+    El objeto se comporta como un arreglo de la forma `generaciones x population`,
+    así que `np.mean(history, axis=1)` da el fitness promedio de cada
+    generación, igual que con la lista de listas que regresaba `Trainer.train`.
+    Sin embargo, es más barato usar `history.summary('mean')`. Si la población
+    cambia de tamaño entre generaciones (como con `method='old'`), hay que usar
+    `np.nanmean` en su lugar; las estadísticas ya ignoran los NaN.
+    """
+    def __init__(self, population, generations=16, path=None, dtype=np.float32,
+                 percentiles=(10, 50, 90)):
+        self.population = population
+        self.path = path
+        self.dtype = np.dtype(dtype)
+        self.percentiles = list(percentiles)
+        self.columns = ['mean', 'std', 'min', 'max'] + ['p{}'.format(p) for p in self.percentiles]
+        self.length = 0
+        self.data = self.allocate(max(generations, 1))
+        self.stats = np.empty((len(self.data), len(self.columns)))
+
+    def allocate(self, generations):
+        """
+        Reserva el arreglo de fitness, en memoria o en `self.path`.
+        """
+        shape = (generations, self.population)
+        if self.path is None:
+            return np.empty(shape, dtype=self.dtype)
+        return np.lib.format.open_memmap(self.path, mode='w+', dtype=self.dtype, shape=shape)
+
+    def grow(self):
+        """
+        Duplica la capacidad de la historia, conservando lo que ya se guardó.
+        """
+        capacity = 2*len(self.data)
+        if self.path is None:
+            data = self.allocate(capacity)
+            data[:self.length] = self.data[:self.length]
+        else: # Copiamos a un archivo nuevo y lo ponemos en lugar del anterior
+            path = self.path
+            self.path = path + '.tmp'
+            data = self.allocate(capacity)
+            data[:self.length] = self.data[:self.length]
+            data.flush()
+            del data
+            self.data = None
+            self.path = path
+            os.replace(path + '.tmp', path)
+            data = np.load(path, mmap_mode='r+')
+        self.data = data
+        stats = np.empty((capacity, len(self.columns)))
+        stats[:self.length] = self.stats[:self.length]
+        self.stats = stats
+
+    def append(self, fitness):
+        """
+        Agrega el fitness de una generación y calcula sus estadísticas.
+
+        Parámetros
+        ----------
+        fitness : list-like
+            Fitness de cada individuo de la generación, a lo más `population`
+            valores. Los NaN cuentan como individuos faltantes.
+        """
+        fitness = np.asarray(fitness)
+        if len(fitness) > self.population:
+            raise ValueError("La generación tiene {} individuos, más que {}".format(len(fitness), self.population))
+        if self.length == len(self.data):
+            self.grow()
+        row = self.data[self.length]
+        row[:len(fitness)] = fitness
+        row[len(fitness):] = np.nan
+        valid = row[~np.isnan(row)]
+        self.stats[self.length] = [valid.mean(dtype=float), valid.std(dtype=float), valid.min(), valid.max()] \
+                                  + list(np.percentile(valid, self.percentiles))
+        self.length += 1
+
+    def summary(self, column):
+        """
+        Regresa una estadística de todas las generaciones.
+
+        Parámetros
+        ----------
+        column : str
+            Nombre de la estadística (véase `self.columns`).
+
+        Salida
+        ------
+        values : numpy.array
+            Arreglo con el valor de la estadística para cada generación.
+        """
+        return self.stats[:self.length, self.columns.index(column)]
+
+    def flush(self):
+        """
+        Escribe a disco los cambios, si la historia está mapeada a memoria.
+        """
+        if self.path is not None:
+            self.data.flush()
+
+    @property
+    def values(self):
+        """
+        Arreglo de la forma `generaciones x population` con las generaciones guardadas.
+        """
+        return self.data[:self.length]
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, index):
+        return self.values[index]
+
+    def __iter__(self):
+        return iter(self.values)
+
+    def __array__(self, dtype=None, copy=None):
+        return np.asarray(self.values, dtype=dtype)
+
+    def __repr__(self):
+        return "FitnessHistory(generations={}, population={})".format(self.length, self.population)
@@ -5,7 +5,7 @@ Este archivo contiene funciones para implementar algoritmos genéticos.
 import numpy as np
 import random
 
-from operator import itemgetter
+from instrumentation import Profiler
 
 def crossover(a, b, verbose=False):
     """
@@ -35,9 +35,10 @@ def crossover(a, b, verbose=False):
 
     Los cromosomas intercambiados son dos hijos nuevos.
     """
-    # Codificamos las redes de ambos individuos en un vector unidimensional
-    a_enc = a.encode()
-    b_enc = b.encode()
+    # Codificamos las redes de ambos individuos en un vector unidimensional.
+    # Copiamos porque en una red plana `encode` regresa los pesos mismos
+    a_enc = np.array(a.encode())
+    b_enc = np.array(b.encode())
 
     # Crossover de un solo punto: escogemos un índice aleatorio donde partir
     # los vectores
@@ -152,7 +153,187 @@ def breed_parents(birds, to_breed, selection='tournament', k=None):
 
     return children
         
-def new_generation(birds, settings):
+def crossover_batch(a, b, method='one_point'):
+    """
+    Cruza muchas parejas de cromosomas a la vez.
+
+    Parámetros
+    ----------
+    a, b : numpy.array
+        Arreglos de la forma `n x G`. Los renglones `a[i]` y `b[i]` son los
+        cromosomas de la i-ésima pareja de padres.
+
+    method : str = 'one_point'
+        Método de crossover
+            - one_point : Crossover de un solo punto (véase `crossover`).
+            - two_point : Crossover de dos puntos. Se intercambia el segmento
+              entre dos índices aleatorios.
+            - uniform : Cada gen se intercambia con probabilidad 1/2.
+
+    Salida
+    ------
+    children : numpy.array
+        Arreglo de la forma `2n x G`. Los renglones `2i` y `2i+1` son los hijos
+        de la i-ésima pareja.
+
+    Notas
+    -----
+    Para cada pareja se construye una máscara booleana con los genes a
+    intercambiar, de modo que todas las parejas se cruzan con una sola
+    operación de numpy.
+    """
+    n, G = a.shape
+    genes = np.arange(G)
+    if method == 'one_point':
+        split = np.random.randint(0, G, (n, 1))
+        mask = genes < split
+    elif method == 'two_point':
+        points = np.sort(np.random.randint(0, G, (n, 2)), axis=1)
+        mask = (genes >= points[:, :1]) & (genes < points[:, 1:])
+    elif method == 'uniform':
+        mask = np.random.random((n, G)) < 0.5
+    else:
+        raise ValueError("Método de crossover desconocido: {}".format(method))
+
+    children = np.empty((2*n, G), dtype=a.dtype)
+    children[0::2] = np.where(mask, b, a)
+    children[1::2] = np.where(mask, a, b)
+    return children
+
+
+def mutate(genomes, rate):
+    """
+    Muta cromosomas en su lugar, sumando ruido gaussiano a una fracción de
+    los genes.
+
+    Parámetros
+    ----------
+    genomes : numpy.array
+        Arreglo de la forma `n x G` con los cromosomas a mutar. Se modifica.
+        El ruido se suma con el tipo de dato de los cromosomas.
+
+    rate : float
+        Probabilidad de que cada gen mute.
+    """
+    mask = np.random.random(genomes.shape) < rate
+    noise = np.random.normal(size=np.count_nonzero(mask)).astype(genomes.dtype, copy=False) # Ruido gaussiano
+    genomes[mask] += noise
+
+
+def tournament_indices(fitness, to_breed, k):
+    """
+    Método de selección por torneo, sobre un vector de fitness.
+
+    Parámetros
+    ----------
+    fitness : numpy.array
+        Fitness de cada individuo.
+
+    to_breed : int
+        Número de parejas a seleccionar.
+
+    k : int
+        Número de participantes por torneo.
+
+    Salida
+    ------
+    parents : numpy.array
+        Arreglo de la forma `to_breed x 2` con los índices de cada pareja.
+    """
+    contestants = np.random.randint(0, len(fitness), (to_breed, k)) # k participantes por torneo
+    order = np.argsort(fitness[contestants], axis=1)[:, :-3:-1] # Los dos mejores de cada torneo
+    return np.take_along_axis(contestants, order, axis=1)
+
+
+def roulette_indices(fitness, to_breed):
+    """
+    Método de selección por ruleta, sobre un vector de fitness.
+
+    Parámetros
+    ----------
+    fitness : numpy.array
+        Fitness de cada individuo.
+
+    to_breed : int
+        Número de parejas a seleccionar.
+
+    Salida
+    ------
+    parents : numpy.array
+        Arreglo de la forma `to_breed x 2` con los índices de cada pareja.
+    """
+    s = fitness.sum()
+    if s == 0: # Si todos los participantes son igual de malos
+        selection_probs = None
+    else: # Pesamos las probabilidades por el fitness de cada participante
+        selection_probs = fitness/s
+    return np.random.choice(len(fitness), (to_breed, 2), p=selection_probs)
+
+
+def next_generation(genomes, fitness, settings, profiler=None):
+    """
+    Produce los cromosomas de una nueva generación a partir de la matriz de
+    cromosomas de la generación actual.
+
+    Parámetros
+    ----------
+    genomes : numpy.array
+        Arreglo de la forma `P x G`, con un cromosoma por renglón.
+
+    fitness : numpy.array
+        Fitness de cada individuo.
+
+    settings : dict
+        Diccionario con parámetros de configuración. El método de crossover se
+        toma de `settings['CROSSOVER_METHOD']` (por omisión 'one_point').
+
+    profiler : Profiler = None
+        Perfilador donde registrar las fases de selección, crossover y mutación.
+
+    Salida
+    ------
+    out : tuple
+        Tupla de la forma (g, e, h), donde g es un arreglo de la forma `P x G`
+        con los cromosomas nuevos, ordenados como élites, hijos y normales, y
+        `e` y `h` son el número de élites e hijos.
+    """
+    MUTATION = settings['MUTATION'] # Tasa de mutación
+    CROSSOVER = settings['CROSSOVER'] # Tasa de crossover
+    ELITISM = settings['ELITISM'] # Tasa de elitismo
+    SELECTION = settings['SELECTION'] # Método de selección
+    CONTESTANTS = settings['CONTESTANTS'] # Participantes en selección por torneo
+    CROSSOVER_METHOD = settings.get('CROSSOVER_METHOD', 'one_point') # Método de crossover
+    if profiler is None:
+        profiler = Profiler()
+    fitness = np.asarray(fitness, dtype=float)
+    P = len(genomes)
+
+    with profiler.phase('selection', objects=P):
+        # Élites
+        num_elite = int(P*ELITISM)
+        elite_index = np.argsort(fitness)[::-1][:num_elite]
+
+        # Parejas a cruzar
+        to_breed = int(CROSSOVER * P/2) # Número de parejas a seleccionar
+        if SELECTION == 'roulette':
+            parents = roulette_indices(fitness, to_breed)
+        elif SELECTION == 'tournament':
+            parents = tournament_indices(fitness, to_breed, CONTESTANTS)
+
+    # Hijos
+    with profiler.phase('crossover', objects=to_breed):
+        children = crossover_batch(genomes[parents[:, 0]], genomes[parents[:, 1]], CROSSOVER_METHOD)
+        num_children = len(children)
+
+        # Normales, escogidos de manera aleatoria
+        normal_index = np.random.randint(0, P, P - num_elite - num_children)
+        new = np.concatenate([genomes[elite_index], children, genomes[normal_index]])
+
+    with profiler.phase('mutation', objects=P - num_elite):
+        mutate(new[num_elite:], MUTATION) # Los élites no mutan
+    return new, num_elite, num_children
+
+def new_generation(birds, settings, profiler=None):
     """
     Produce una nueva generación de pájaros.
 
@@ -164,56 +345,26 @@ def new_generation(birds, settings):
     settings : dict
         Diccionario con parámetros de configuración.
 
+    profiler : Profiler = None
+        Perfilador donde registrar cada fase (codificación, selección,
+        crossover, mutación y decodificación).
+
     Salida
     ------
     children : tuple
         Tupla de la forma (e, h, n), donde e es una lista de pájaros élite,
         h de los pájaros productos de crossover, y n de pájaros normales.        
     """
-
-    MUTATION = settings['MUTATION'] # Tasa de mutación
-    CROSSOVER = settings['CROSSOVER'] # Tasa de crossover
-    ELITISM = settings['ELITISM'] # Tasa de elitismo
-    SELECTION = settings['SELECTION'] # Método de selección
-    CONTESTANTS = settings['CONTESTANTS'] # Participantes en selección por torneo
-    fitness = [b.fitness for b in birds]
-    sorted_index = np.argsort(fitness)[::-1] # Índices ordenados por fitness descendiente
-
-    # Élites
-    num_elite = int(len(sorted_index)*ELITISM)
-    elite_index = sorted_index[:num_elite]
-    if num_elite == 0:
-        elites = []
-    elif num_elite == 1: # Si solo hay un índice, no podemos usar `itemgetter`
-        elites = [birds[elite_index[0]]]
-    else:
-        elites = list(itemgetter(*elite_index)(birds))
-    elites = [b.network.encode() for b in elites]
-    
-    # Hijos
-    to_breed = int(CROSSOVER * len(birds)/2) # Número de parejas a seleccionar
-    children = breed_parents(birds, to_breed, SELECTION, CONTESTANTS)
-    num_children = len(children)
-    
-    # Normales
-    missing = len(birds) - num_elite - num_children # Los normales son todos los que faltan
-    normals = np.random.choice(birds, missing) # Escogidos de manera aleatoria
-    normals = [b.network.encode() for b in normals]
-    
-    # Mutación
-    to_mutate = children + normals # Los élites no mutan
-
-    # Número de mutaciones en el **genoma total** (NO el número de individuos)
-    mutation_number = int(MUTATION * len(to_mutate) * len(to_mutate[0])) 
-
-    # Escogemos cromosomas aleatorios a mutar
-    mutated_inds = np.random.randint(0, len(to_mutate)-1, mutation_number) 
-    # Escogemos genes para cada cromosoma
-    mutated_genes = np.random.randint(0, len(to_mutate[0])-1, mutation_number)
-    for i,j in zip(mutated_inds, mutated_genes):
-        to_mutate[i][j] += np.random.normal() # Ruido gaussiano
-        
-    # Unión
-    return [birds[0].network.decode(b) for b in elites], \
-           [birds[0].network.decode(b) for b in to_mutate[:num_children]], \
-           [birds[0].network.decode(b) for b in to_mutate[num_children:]]
\ No newline at end of file
+    if profiler is None:
+        profiler = Profiler()
+    with profiler.phase('encode', objects=len(birds)):
+        genomes = np.stack([b.network.encode() for b in birds])
+        fitness = [b.fitness for b in birds]
+    genomes, num_elite, num_children = next_generation(genomes, fitness, settings, profiler)
+    start_normal = num_elite + num_children
+
+    # Unión. Si las redes son planas, cada red es una vista de `genomes`
+    with profiler.phase('decode', objects=len(genomes)):
+        return [birds[0].network.decode(b) for b in genomes[:num_elite]], \
+               [birds[0].network.decode(b) for b in genomes[num_elite:start_normal]], \
+               [birds[0].network.decode(b) for b in genomes[start_normal:]]
@@ -0,0 +1,149 @@
+"""
+Este archivo implementa herramientas para medir el tiempo y el tamaño de los
+datos de cada fase del entrenamiento.
+"""
+
+import csv
+import json
+import pickle
+import time
+
+from contextlib import nullcontext
+
+class Phase:
+    """
+    Manejador de contexto que mide el tiempo de una fase y la registra al
+    salir. Véase `Profiler.phase`.
+
+    Parámetros
+    ----------
+    profiler : Profiler
+        Perfilador donde guardar el registro.
+
+    record : dict
+        Registro de la fase. Se le agrega la llave `seconds` al salir, y se
+        pueden agregar más llaves dentro del bloque `with`.
+    """
+    def __init__(self, profiler, record):
+        self.profiler = profiler
+        self.record = record
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self.record
+
+    def __exit__(self, *args):
+        self.record['seconds'] = time.perf_counter() - self.start
+        self.profiler.records.append(self.record)
+
+class Profiler:
+    """
+    Clase que registra el tiempo y el número de objetos o bytes de cada fase de
+    cada generación.
+
+    Parámetros
+    ----------
+    enabled : bool = False
+        Si registrar algo. Si es `False`, `phase` regresa un contexto vacío
+        y `add` no hace nada, por lo que el costo es casi nulo.
+
+    Atributos
+    ---------
+    records : list
+        Lista de registros. Cada uno es un diccionario con al menos las
+        llaves `generation` y `phase`.
+
+    generation : int
+        Generación a la que se asignan los registros nuevos.
+
+    Notas
+    -----
+    Uso típico:
+
+        with profiler.phase('send', objects=len(tasks)) as record:
+            if profiler.enabled:
+                record['bytes'] = profiler.size(tasks)
+            ...
+    """
+    FIELDS = ['generation', 'phase', 'seconds', 'objects', 'bytes', 'pid', 'steps', 'birds']
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.records = []
+        self.generation = None
+        self.null = nullcontext({}) # Contexto a regresar cuando está deshabilitado
+
+    def phase(self, name, **counts):
+        """
+        Mide una fase del entrenamiento.
+
+        Parámetros
+        ----------
+        name : str
+            Nombre de la fase.
+
+        **counts
+            Conteos adicionales a guardar en el registro, por ejemplo `objects`.
+
+        Salida
+        ------
+        context : Phase
+            Manejador de contexto que regresa el registro de la fase.
+        """
+        if not self.enabled:
+            return self.null
+        return Phase(self, dict(generation=self.generation, phase=name, **counts))
+
+    def add(self, name, **values):
+        """
+        Agrega un registro ya medido, por ejemplo el reportado por un proceso.
+
+        Parámetros
+        ----------
+        name : str
+            Nombre de la fase.
+
+        **values
+            Valores del registro.
+        """
+        if self.enabled:
+            self.records.append(dict(generation=self.generation, phase=name, **values))
+
+    def size(self, obj):
+        """
+        Calcula cuántos bytes ocupa un objeto serializado con `pickle`.
+        """
+        return len(pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL))
+
+    def summary(self):
+        """
+        Suma el tiempo de cada fase sobre todas las generaciones.
+
+        Salida
+        ------
+        totals : dict
+            Diccionario de la forma {fase: segundos}.
+        """
+        totals = {}
+        for r in self.records:
+            totals[r['phase']] = totals.get(r['phase'], 0) + r.get('seconds', 0)
+        return totals
+
+    def to_json(self, path):
+        """
+        Guarda los registros en un archivo JSON, como una lista de diccionarios.
+        """
+        with open(path, 'w') as f:
+            json.dump(self.records, f, indent=1)
+
+    def to_csv(self, path):
+        """
+        Guarda los registros en un archivo CSV, con una columna por llave.
+        """
+        fields = list(self.FIELDS)
+        for r in self.records:
+            fields += [k for k in r if k not in fields]
+        with open(path, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=fields)
+            writer.writeheader()
+            writer.writerows(self.records)
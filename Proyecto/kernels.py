@@ -0,0 +1,268 @@
+"""
+Este archivo implementa la simulación completa de un mundo (física,
+colisiones, recompensas y la red de cada pájaro) como una sola función
+compilada con Numba. Véase `bird.JitWorld`.
+
+Si Numba no está instalado, `NUMBA` es `False` y las funciones siguen
+funcionando, pero como Python puro, así que `bird_utils.make_world` usa
+`VectorWorld` en su lugar.
+"""
+
+import numpy as np
+
+import neural_network as nn
+
+try:
+    import numba
+    NUMBA = True
+except ImportError:
+    numba = None
+    NUMBA = False
+
+def jit(f):
+    """
+    Compila una función con `numba.njit` si está disponible.
+    """
+    if numba is None:
+        return f
+    return numba.njit(cache=True)(f)
+
+# Códigos de las funciones de activación, por nombre
+HIDDEN = {'ident': 0, 'sigmoid': 1, 'relu': 2, 'tanh': 3, 'step': 4}
+LAST = {'ident': 0, 'binary': 1, 'step': 2}
+
+def activation_codes(settings):
+    """
+    Traduce las funciones de activación de la configuración a los códigos del
+    kernel (véase `function_code`).
+
+    Parámetros
+    ----------
+    settings : dict
+        Diccionario de configuración.
+
+    Salida
+    ------
+    codes : tuple
+        Tupla `(hidden, last)` con un arreglo de códigos por capa y el código
+        de la última función, o `None` si alguna no tiene equivalente.
+    """
+    return function_codes(settings['ACTIVATION_FUNCTIONS'], settings['LAST_ACTIVATION'])
+
+def function_code(f, codes):
+    """
+    Código del kernel de una función de activación, o `None` si no tiene.
+
+    Parámetros
+    ----------
+    f : {str, neural_network.Activation}
+        Función de activación o nombre de una registrada.
+
+    codes : dict
+        `HIDDEN` o `LAST`.
+
+    Notas
+    -----
+    Sólo se traducen las funciones propias de `neural_network` (como
+    `neural_network.sigmoid`), comparando el objeto mismo: una función del
+    usuario con el mismo nombre, o registrada de nuevo con ese nombre, tiene
+    otro comportamiento que el kernel no conoce.
+    """
+    if isinstance(f, str):
+        f = nn.ACTIVATIONS.get(f)
+    name = getattr(f, 'name', None)
+    if name not in codes or f is not getattr(nn, name) or f is not nn.ACTIVATIONS.get(name):
+        return None
+    return codes[name]
+
+def function_codes(functions, last):
+    """
+    Traduce funciones de activación (o sus nombres) a los códigos del kernel
+    (véase `activation_codes`).
+    """
+    hidden = [function_code(f, HIDDEN) for f in functions]
+    last = function_code(last, LAST)
+    if None in hidden or last is None:
+        return None
+    return np.array(hidden, dtype=np.int64), last
+
+@jit
+def activate(z, code):
+    if code == 1:
+        return 1 / (1 + np.exp(-z))
+    elif code == 2:
+        return z if z > 0 else 0.0
+    elif code == 3:
+        return np.tanh(z)
+    elif code == 4:
+        return 1.0 if z > 0 else 0.0
+    return z
+
+@jit
+def intersects(cy, radius, rx, ry, width, height):
+    # Igual que `bird.intersects_array`, para un círculo en x = 0
+    cdistx, cdisty = abs(0 - rx), abs(cy - ry)
+    if cdistx > width/2 + radius or cdisty > height/2 + radius:
+        return False
+    if cdistx <= width/2 or cdisty <= height/2:
+        return True
+    return (cdistx - width/2)**2 + (cdisty - height/2)**2 <= radius**2
+
+@jit
+def forward(genome, sizes, hidden, last, x, a, b):
+    """
+    Evalúa una red codificada (véase `NeuralNet.encode`) y regresa si aletea.
+    `a` y `b` son arreglos de trabajo de tamaño `max(sizes)`.
+    """
+    a[:sizes[0]] = x
+    k = 0
+    for l in range(len(sizes) - 1):
+        n, m = sizes[l], sizes[l + 1]
+        for i in range(m):
+            z = 0.0
+            for j in range(n):
+                z += genome[k + i*n + j] * a[j]
+            b[i] = z
+        k += m*n
+        for i in range(m):
+            b[i] = activate(b[i] + genome[k + i], hidden[l])
+        k += m
+        a, b = b, a
+    if last == 1: # binary
+        return a[0] > 0.5
+    elif last == 2: # step
+        return a[0] > 0
+    return a[0] != 0
+
+@jit
+def rollout(genomes, sizes, hidden, last, params, schedules, course,
+            y, vy, alive, fitness, px, index, order, steps, next_pipe, max_steps):
+    """
+    Simula un mundo hasta que mueren todos los pájaros o se dan `max_steps`
+    pasos, modificando el estado en su lugar.
+
+    Parámetros
+    ----------
+    genomes : numpy.array
+        Arreglo de la forma `N x G` con el cromosoma de cada pájaro.
+
+    sizes, hidden, last
+        Tamaño de cada capa y códigos de las funciones de activación (véase
+        `activation_codes`).
+
+    params : numpy.array
+        Constantes de la configuración, en el orden de `bird.JitWorld.params`.
+
+    schedules : numpy.array
+        Arreglo de la forma `recorridos x tuberías` con la altura de la
+        apertura de cada tubería de cada recorrido.
+
+    course : numpy.array
+        Recorrido de cada pájaro (véase `bird.VectorWorld.course`).
+
+    y, vy, alive, fitness : numpy.array
+        Estado de cada pájaro.
+
+    px, index, order : numpy.array
+        Posición de cada tubería, índice en el recorrido de su altura, y el
+        orden en que están en la lista `World.pipes`.
+
+    steps, next_pipe, max_steps : int
+        Pasos dados, índice de la siguiente tubería del recorrido y máximo
+        número de pasos a dar.
+
+    Salida
+    ------
+    out : tuple
+        Tupla `(steps, next_pipe, world_alive)`.
+
+    Notas
+    -----
+    Las operaciones de punto flotante se hacen en el mismo orden que en
+    `World`, incluyendo la forma en que `World.step_pipes` recorre la lista de
+    tuberías mientras la modifica, para dar exactamente el mismo fitness.
+
+    Las tuberías de todos los recorridos se mueven igual, así que sólo se
+    guarda su posición una vez y cada pájaro lee la altura de su recorrido.
+    """
+    (VX_DT, RIGHT, PIPE_WIDTH, PIPE_GAP, TOP, BIRD_RADIUS, ACCEL, DT, G_DT, MIN_VELOCITY,
+     FLAP_SPEED, ALIVE_REWARD, PIPE_REWARD, MAX_STEPS) = params
+    N = len(y)
+    P = len(px)
+    width = 0
+    for s in sizes:
+        width = max(width, s)
+    a = np.empty(width)
+    b = np.empty(width)
+    x = np.empty(2)
+    active = np.empty(N, dtype=np.int64)
+    count = 0
+    for i in range(N):
+        if alive[i]:
+            active[count] = i
+            count += 1
+    world_alive = True
+    for _ in range(max_steps):
+        # Tuberías
+        passed = False
+        i = 0
+        while i < P:
+            p = order[i]
+            px[p] += VX_DT
+            if px[p] + PIPE_WIDTH + BIRD_RADIUS < 0:
+                for k in range(i, P - 1): # pop(i) y append
+                    order[k] = order[k + 1]
+                order[P - 1] = p
+                if next_pipe >= schedules.shape[1]:
+                    raise ValueError("Recorrido de tuberías agotado")
+                px[p] = RIGHT
+                index[p] = next_pipe
+                next_pipe += 1
+                passed = True
+            i += 1
+
+        # Pájaros
+        first = order[0]
+        x[0] = px[first]
+        for k in range(count):
+            i = active[k]
+            x[1] = y[i] - schedules[course[i], index[first]]
+            flap = forward(genomes[i], sizes, hidden, last, x, a, b)
+            y[i] += ACCEL + vy[i] * DT
+            if flap:
+                vy[i] = FLAP_SPEED
+            elif vy[i] > MIN_VELOCITY:
+                vy[i] += G_DT
+            if y[i] > TOP:
+                y[i] = TOP
+
+        # Colisiones, con los rectángulos de `Pipe.reset`
+        survivors = 0
+        for k in range(count):
+            i = active[k]
+            dead = y[i] - BIRD_RADIUS <= 0
+            for j in range(P):
+                p = order[j]
+                py = schedules[course[i], index[p]]
+                height_bot = py - PIPE_GAP/2
+                height_top = TOP - py - PIPE_GAP/2
+                cx = px[p] + PIPE_WIDTH/2
+                if intersects(y[i], BIRD_RADIUS, cx, height_bot/2, PIPE_WIDTH, height_bot) or \
+                   intersects(y[i], BIRD_RADIUS, cx, py + PIPE_GAP/2 + height_top/2, PIPE_WIDTH, height_top):
+                    dead = True
+            if dead:
+                alive[i] = False
+            else:
+                active[survivors] = i
+                survivors += 1
+        count = survivors
+
+        steps += 1
+        if count == 0 or steps > MAX_STEPS:
+            world_alive = False
+        reward = ALIVE_REWARD + (PIPE_REWARD if passed else 0.0)
+        for k in range(count):
+            fitness[active[k]] += reward
+        if not world_alive:
+            break
+    return steps, next_pipe, world_alive
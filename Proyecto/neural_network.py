@@ -13,8 +13,103 @@ from itertools import islice
 def evaluate(a, b):
     return b(a)
 
-def ident(x):
-    return x
+class Activation:
+    """
+    Función de activación con nombre, que se puede evaluar en su lugar.
+
+    Parámetros
+    ----------
+    name : str
+        Nombre con el que se registra en `ACTIVATIONS`.
+
+    f : callable
+        Función de la forma `f(x, out=None)`. Si `out` no es `None`, escribe
+        el resultado en `out` (que puede ser el mismo `x`) y lo regresa, sin
+        reservar memoria.
+
+    elementwise : bool = True
+        Si la función se aplica entrada por entrada, de modo que `out` tiene
+        la forma de `x`.
+
+    Notas
+    -----
+    Se serializa sólo con su nombre, así que las redes se pueden enviar a
+    otros procesos con `pickle` de la biblioteca estándar, sin importar si la
+    función original es una lambda.
+    """
+    def __init__(self, name, f, elementwise=True):
+        self.name = self.__name__ = name
+        self.f = f
+        self.elementwise = elementwise
+
+    def __call__(self, x, out=None):
+        return self.f(x, out)
+
+    def __reduce__(self):
+        return activation, (self.name,)
+
+    def __repr__(self):
+        return "activation({!r})".format(self.name)
+
+ACTIVATIONS = {} # Funciones de activación registradas, por nombre
+
+def register(name, f, elementwise=True):
+    """
+    Registra una función de activación (véase `Activation`) y la regresa.
+    """
+    ACTIVATIONS[name] = Activation(name, f, elementwise)
+    return ACTIVATIONS[name]
+
+def activation(f):
+    """
+    Regresa la función de activación registrada con el nombre `f`. Si `f` no
+    es una cadena, se regresa tal cual.
+    """
+    if isinstance(f, str):
+        try:
+            return ACTIVATIONS[f]
+        except KeyError:
+            raise ValueError("Función de activación desconocida: {!r}".format(f)) from None
+    return f
+
+def activation_name(f):
+    """
+    Nombre de una función de activación, dada como cadena o como función.
+    """
+    if isinstance(f, str):
+        return f
+    return getattr(f, '__name__', repr(f))
+
+def _ident(x, out=None):
+    if out is None or out is x:
+        return x
+    out[...] = x
+    return out
+
+def _sigmoid(x, out=None): # 1/(1 + exp(-x)), con las mismas operaciones
+    out = np.negative(x, out=out)
+    np.exp(out, out=out)
+    out += 1
+    return np.reciprocal(out, out=out)
+
+def _relu(x, out=None):
+    return np.maximum(x, 0, out=out)
+
+def _tanh(x, out=None):
+    return np.tanh(x, out=out)
+
+def _binary(x, out=None): # Sólo importa la primera neurona
+    return np.greater(x[0], 0.5, out=out)
+
+def _step(x, out=None):
+    return np.greater(x, 0, out=out)
+
+ident = register('ident', _ident)
+sigmoid = register('sigmoid', _sigmoid)
+relu = register('relu', _relu)
+tanh = register('tanh', _tanh)
+binary = register('binary', _binary, elementwise=False)
+step = register('step', _step)
 
 class Layer:
     """
@@ -26,8 +121,15 @@ class Layer:
         - Si son enteros, `a` es el número de entradas, y b el número de salidas.
         - Si son arreglos de numpy, `a` corresponde a `self.W` y `b` a `self.b`
 
-    f : callable
-        Función de activación de la capa. 
+    f : {callable, str}
+        Función de activación de la capa, o el nombre de una registrada en
+        `ACTIVATIONS`.
+
+    dtype : numpy.dtype = float
+        Tipo de dato de los pesos aleatorios, si `a` y `b` son enteros. Con
+        `numpy.float32` la capa ocupa la mitad de memoria, y sus cromosomas la
+        mitad de bytes al enviarse a otros procesos. Los números aleatorios
+        son los mismos con cualquier tipo.
 
     Atributos
     ---------
@@ -43,17 +145,26 @@ class Layer:
     f : callable
         Función de activación de la capa.
     """
-    def __init__(self, a, b, f=ident):
+    def __init__(self, a, b, f=ident, dtype=float):
         if isinstance(a, int):
-            self.W = np.random.normal(size=(b, a))
-            self.b = np.random.normal(size=b)
+            self.W = np.random.normal(size=(b, a)).astype(dtype, copy=False)
+            self.b = np.random.normal(size=b).astype(dtype, copy=False)
         else:
             self.W = a
             self.b = b
-        self.f = f
+        self.f = activation(f)
 
-    def __call__(self, x):
-        return self.f(self.W @ x + self.b)
+    def __call__(self, x, out=None):
+        """
+        Evalúa la capa. Si se da `out`, un arreglo de tamaño `m`, se escribe
+        ahí el resultado sin reservar memoria; para esto `self.f` debe ser una
+        `Activation` que se aplique entrada por entrada.
+        """
+        if out is None:
+            return self.f(self.W @ np.asarray(x, dtype=self.W.dtype) + self.b)
+        np.matmul(self.W, x, out=out)
+        out += self.b
+        return self.f(out, out=out)
         
     def __copy__(self):
         W = copy(self.W)
@@ -100,7 +211,7 @@ class Layer:
         """
         return np.concatenate([self.W.flatten(), self.b])
         
-    def decode(self, sequence):
+    def decode(self, sequence, copy=True):
         """
         Decodifica una capa codificada
 
@@ -111,16 +222,38 @@ class Layer:
             donde `m` y `n` son las dimensiones de `self.W` y `b` la dimensión
             de `self.b`.
 
+        copy : bool = True
+            Si copiar las entradas. Si es `False`, los pesos y bias de la capa
+            decodificada son vistas de `sequence`.
+
         Salida
         ------
         decoded : Layer
             Capa con las entradas del vector decodificado como pesos y bias.
         """
         W_size = self.W.shape[0]*self.W.shape[1]
-        W = sequence[:W_size].reshape(self.W.shape).copy()
-        b = sequence[W_size:].copy()
+        W = sequence[:W_size].reshape(self.W.shape)
+        b = sequence[W_size:]
+        if copy:
+            W, b = W.copy(), b.copy()
         decoded = Layer(W, b, self.f)
         return decoded
+
+    def bind(self, sequence):
+        """
+        Convierte `self.W` y `self.b` en vistas de un vector codificado, sin
+        copiar. Cualquier cambio en `sequence` se refleja en la capa, y
+        viceversa.
+
+        Parámetros
+        ----------
+        sequence : numpy.array
+            Vector contiguo con `len(self)` entradas, con el formato de
+            `Layer.encode`.
+        """
+        W_size = self.W.shape[0]*self.W.shape[1]
+        self.W = sequence[:W_size].reshape(self.W.shape)
+        self.b = sequence[W_size:]
             
 
 class NeuralNet:
@@ -135,10 +268,18 @@ class NeuralNet:
         - Si es una lista de objetos `Layer`, cada entrada es una capa diferente.
 
     activation_functions : list
-        Lista de funciones de activación de cada capa, en orden entrada -> salida.
+        Lista de funciones de activación de cada capa, en orden entrada -> salida,
+        o de sus nombres (véase `ACTIVATIONS`).
 
-    last_activation : callable = ident
-        Función de activación de la última capa.
+    last_activation : {callable, str} = ident
+        Función de activación de la última capa, o su nombre.
+
+    flat : bool = False
+        Si guardar todos los pesos en un solo vector contiguo. Véase `genome`.
+
+    dtype : numpy.dtype = float
+        Tipo de dato de los pesos, si `layers` es una lista de enteros (véase
+        `Layer`). Las redes decodificadas tienen el tipo del cromosoma.
 
     Atributos
     ---------
@@ -148,18 +289,98 @@ class NeuralNet:
 
     f : callable
         Función de activación de la última capa.
+
+    genome : numpy.array
+        Vector contiguo con el cromosoma de la red, o `None` si la red no es
+        plana. En una red plana los atributos `W` y `b` de cada capa son vistas
+        de este vector, por lo que `encode` y `decode` no copian nada y mutar
+        el cromosoma modifica directamente los pesos.
+
+    compiled : bool
+        Si la red se evalúa sin reservar memoria (véase `compile`).
+
+    buffers : list
+        Arreglos de trabajo reservados por `compile`, o `None`.
     """
-    def __init__(self, layers, activation_functions=None, last_activation=ident):
+    def __init__(self, layers, activation_functions=None, last_activation=ident, flat=False, dtype=float):
         if isinstance(layers[0], Layer):
             self.layers = layers
         else:
-            self.layers = [Layer(conf_layer1, conf_layer2, ac_fun) \
+            self.layers = [Layer(conf_layer1, conf_layer2, ac_fun, dtype) \
                            for conf_layer1, conf_layer2, ac_fun \
                            in zip(layers, layers[1:], activation_functions)]
-        self.f = last_activation
+        self.f = activation(last_activation)
+        self.genome = None
+        self.compiled = False
+        self.buffers = None
+        self.codes = None
+        if flat:
+            self.bind(self.encode())
         
     def __call__(self, x):
-        return self.f(reduce(evaluate, self.layers, x))
+        if self.buffers is None:
+            return self.f(reduce(evaluate, self.layers, x))
+        x = np.asarray(x)
+        if x.ndim != 1: # Un lote de entradas
+            return self.f(reduce(evaluate, self.layers, x))
+        if self.codes is not None:
+            return self.kernel(self.genome, *self.codes, x, *self.buffers)
+        for l, out in zip(self.layers, self.buffers):
+            x = l(x, out)
+        return self.f(x)
+
+    @property
+    def dtype(self):
+        """
+        Tipo de dato de los pesos.
+        """
+        return self.layers[0].W.dtype
+
+    def compile(self):
+        """
+        Prepara la red para evaluarse sin reservar memoria en cada llamada. La
+        red se vuelve plana (véase `genome`).
+
+        Salida
+        ------
+        compiled : bool
+            Si se pudo compilar la red: todas sus activaciones deben ser
+            objetos `Activation` que se apliquen entrada por entrada.
+
+        Notas
+        -----
+        Si Numba está instalado, todas las activaciones son las propias de
+        este módulo (comparadas como objetos, véase `kernels.function_code`) y
+        la última es `binary`, o `step` con una sola salida, la red se evalúa
+        con `kernels.forward` sobre dos arreglos de trabajo reservados aquí, y
+        regresa sólo la decisión de aletear. En otro caso, incluso si una
+        activación del usuario se llama igual que una del kernel, cada capa se
+        evalúa en su lugar con su propia función sobre un arreglo propio
+        (véase `Layer.__call__`), y la salida puede ser el arreglo de la
+        última capa, que se sobrescribe en la siguiente llamada.
+
+        Con redes tan pequeñas como las de los pájaros, numpy tarda más en
+        despachar cada operación que en reservar memoria, así que la versión
+        con numpy no es más rápida; la de Numba sí lo es, por mucho.
+        """
+        if not all(isinstance(l.f, Activation) and l.f.elementwise for l in self.layers):
+            return False
+        if self.genome is None:
+            self.bind(self.encode())
+        import kernels
+        codes = None # Sólo las funciones propias tienen código; las demás usan numpy
+        if kernels.NUMBA and (self.f is binary or (self.f is step and len(self.layers[-1].b) == 1)):
+            codes = kernels.function_codes([l.f for l in self.layers], self.f)
+        if codes is not None:
+            sizes = np.array([self.layers[0].W.shape[1]] + [len(l.b) for l in self.layers], dtype=np.int64)
+            self.kernel = kernels.forward
+            self.codes = (sizes,) + codes
+            self.buffers = [np.empty(sizes.max()), np.empty(sizes.max())]
+        else:
+            self.codes = None
+            self.buffers = [np.empty(len(l.b), dtype=l.W.dtype) for l in self.layers]
+        self.compiled = True
+        return True
         
     def __str__(self):
         s = ""
@@ -190,6 +411,41 @@ class NeuralNet:
     
     def __eq__(self, other):
         return self.f == other.f and all([l1 == l2 for l1, l2 in zip(self.layers, other.layers)])
+
+    def __getstate__(self): # Una red plana se serializa sólo con su cromosoma
+        state = self.__dict__.copy()
+        state.pop('kernel', None) # Se vuelve a compilar al deserializar
+        state['buffers'] = state['codes'] = None
+        if self.genome is not None:
+            state['layers'] = [(l.W.shape, l.f) for l in self.layers]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if self.genome is not None:
+            self.layers = [Layer(np.empty(shape, self.genome.dtype), np.empty(shape[0], self.genome.dtype), f)
+                           for shape, f in self.layers]
+            self.bind(self.genome)
+        if state.get('compiled', False):
+            self.compile()
+
+    def bind(self, genome):
+        """
+        Convierte la red en una red plana, cuyos pesos son vistas de `genome`.
+
+        Parámetros
+        ----------
+        genome : numpy.array
+            Vector contiguo con el formato de `NeuralNet.encode`. No se copia.
+        """
+        start = 0
+        for l in self.layers:
+            end = start + len(l)
+            l.bind(genome[start:end])
+            start = end
+        self.genome = genome
+        if self.compiled: # Los arreglos de trabajo dependen del tipo de dato
+            self.compile()
             
     def encode(self):
         """
@@ -200,8 +456,10 @@ class NeuralNet:
         encoded : numpy.array
             Vector unidimensional obtenido al concatenar el cromosoma codificado
             de cada capa, en orden entrada -> salida. Véase `Layer.encode` para
-            más detalles
+            más detalles. Si la red es plana es `self.genome`, sin copiar.
         """
+        if self.genome is not None:
+            return self.genome
         layers = [l.encode() for l in self.layers]
         return np.concatenate(layers)
     
@@ -218,10 +476,105 @@ class NeuralNet:
         Salida
         ------
         decoded : NeuralNet
-            Red neuronal con las capas detalladas en el vector codificado.
+            Red neuronal con las capas detalladas en el vector codificado. Si
+            esta red es plana, la red decodificada también lo es y sus pesos
+            son vistas de `sequence`.
         """
+        if self.genome is not None:
+            layers = [Layer(l.W, l.b, l.f) for l in self.layers]
+            decoded = NeuralNet(layers, last_activation=self.f)
+            decoded.bind(np.asarray(sequence))
+            return decoded
         seq = iter(sequence)
         sizes = [len(l) for l in self.layers]
-        layers_enc = [np.array(list(islice(seq, i))) for i in sizes]
+        layers_enc = [np.array(list(islice(seq, i)), dtype=getattr(sequence, 'dtype', None)) for i in sizes]
         layers = [l.decode(e) for e,l in zip(layers_enc, self.layers)]
-        return NeuralNet(layers, last_activation=self.f)
\ No newline at end of file
+        return NeuralNet(layers, last_activation=self.f)
+
+class PopulationNet:
+    """
+    Clase que representa una población de redes neuronales con la misma
+    topología, evaluadas todas a la vez.
+
+    Parámetros
+    ----------
+    nets : list
+        Lista de `N` objetos `NeuralNet` con la misma topología y funciones de
+        activación.
+
+    Atributos
+    ---------
+    W : list
+        Lista de arreglos de la forma `N x m x n`, uno por capa. La entrada
+        W[k][i,j] es igual a `nets[k].layers[i].W[i,j]`.
+
+    b : list
+        Lista de arreglos de la forma `N x m`, uno por capa.
+
+    functions : list
+        Lista de funciones de activación de cada capa.
+
+    f : callable
+        Función de activación de la última capa.
+
+    Notas
+    -----
+    Las funciones de activación reciben arreglos de la forma `m x N`, es decir,
+    la primera dimensión sigue siendo la de las neuronas, igual que al evaluar
+    una sola red. Así, funciones como `lambda x: x[0] > 0.5` funcionan sin
+    cambios para toda la población.
+    """
+    def __init__(self, nets):
+        depth = len(nets[0].layers)
+        self.W = [np.stack([n.layers[i].W for n in nets]) for i in range(depth)]
+        self.b = [np.stack([n.layers[i].b for n in nets]) for i in range(depth)]
+        self.functions = [l.f for l in nets[0].layers]
+        self.f = nets[0].f
+
+    def __len__(self):
+        return self.W[0].shape[0]
+
+    def subset(self, index):
+        """
+        Construye la población con sólo algunas de las redes.
+
+        Parámetros
+        ----------
+        index : numpy.array
+            Índices de las redes a conservar.
+
+        Salida
+        ------
+        sub : PopulationNet
+            Población con las redes `index`, en ese orden.
+        """
+        sub = copy(self)
+        sub.W = [W[index] for W in self.W]
+        sub.b = [b[index] for b in self.b]
+        return sub
+
+    def __call__(self, x):
+        """
+        Evalúa todas las redes de la población.
+
+        Parámetros
+        ----------
+        x : numpy.array
+            Arreglo de la forma `N x n`. El renglón `i` es la entrada de la
+            i-ésima red.
+
+        Salida
+        ------
+        out : numpy.array
+            Salida de cada red. El renglón `i` es igual a `nets[i](x[i])`.
+            Se calcula con el tipo de dato de los pesos.
+        """
+        h = np.asarray(x, dtype=self.W[0].dtype)
+        for W, b, f in zip(self.W, self.b, self.functions):
+            z = np.matmul(W, h[:, :, None])[:, :, 0]
+            z += b
+            if isinstance(f, Activation) and f.elementwise: # En su lugar, sin arreglos temporales
+                h = f(z.T, out=z.T).T
+            else:
+                h = f(z.T).T
+        return self.f(h.T).T
@@ -0,0 +1,444 @@
+"""
+Este archivo implementa el dibujo rápido de los cuadros de un mundo y su
+escritura como una secuencia de imágenes o como una animación.
+
+Hay dos formas de dibujar un cuadro a partir del estado del mundo (véase
+`World.state`):
+    - Rasterizer : Pinta directamente sobre un arreglo de numpy de índices de
+      color. Es la más rápida.
+    - Renderer : Mueve los objetos de una sola figura de matplotlib que se
+      reutiliza en cada cuadro. Se ve mejor (con antialiasing), pero es más lenta.
+"""
+
+import os
+import shutil
+import subprocess
+
+import numpy as np
+import multiprocess as mp # ¡multiprocess, NO multiprocessING!
+from PIL import Image, GifImagePlugin
+
+_renderer = None # Dibujador de cada proceso de la pool, véase `init_renderer`
+
+class Rasterizer:
+    """
+    Clase que pinta el estado de un mundo directamente sobre un arreglo de
+    numpy, sin matplotlib.
+
+    Parámetros
+    ----------
+    settings : dict
+        Diccionario de configuración.
+
+    birds : int
+        Número de pájaros del mundo.
+
+    width : int = 1600
+        Ancho del cuadro, en pixeles. El alto se escoge para que la proporción
+        sea 1:1, como en `World.plot`.
+
+    draw_dead : bool = False
+        Si dibujar los pájaros muertos.
+
+    Atributos
+    ---------
+    frame : numpy.array
+        Arreglo de la forma `alto x ancho` con el índice del color de cada
+        pixel. Se reutiliza en cada cuadro.
+
+    palette : numpy.array
+        Arreglo de la forma `k x 3` con los colores en RGB. El 0 es el fondo,
+        el 1 las tuberías, el 2 el centro de las aperturas y a partir del 3 el
+        color de cada pájaro.
+
+    colors : numpy.array
+        Índice en `palette` del color de cada pájaro. Si hay dos pájaros son
+        azul y naranja, como en `World.plot`.
+
+    Notas
+    -----
+    Las tuberías son rectángulos alineados con los pixeles, así que se pintan
+    con rebanadas. Los círculos se pintan con una máscara precalculada.
+    """
+    def __init__(self, settings, birds, width=1600, draw_dead=False):
+        RIGHT = settings['RIGHT']
+        TOP = settings['TOP']
+        BIRD_RADIUS = settings['BIRD_RADIUS']
+        self.settings = settings
+        self.draw_dead = draw_dead
+
+        self.scale = width/(RIGHT + 1) # Pixeles por unidad
+        height = int(round(TOP*self.scale))
+        self.frame = np.zeros((height, width), dtype=np.uint8)
+        c0, c1 = (31, 119, 180), (255, 127, 14) # 'C0' y 'C1' de matplotlib
+        if birds == 2:
+            self.palette = np.array([(255, 255, 255), c0, c1, (0, 0, 255), (255, 165, 0)], dtype=np.uint8)
+            self.colors = np.array([3, 4], dtype=np.uint8)
+        else:
+            self.palette = np.array([(255, 255, 255), c0, c1, c0], dtype=np.uint8)
+            self.colors = np.full(birds, 3, dtype=np.uint8)
+        self.bird = self.disc(BIRD_RADIUS*self.scale)
+        self.center = self.disc(0.04*self.scale)
+
+    def disc(self, radius):
+        """
+        Máscara booleana de un círculo del radio dado, en pixeles.
+        """
+        r = max(int(np.ceil(radius)), 1)
+        i, j = np.ogrid[-r:r + 1, -r:r + 1]
+        return i**2 + j**2 <= radius**2
+
+    def pixel(self, x, y):
+        """
+        Renglón y columna del pixel de un punto del mundo.
+        """
+        return int(round(len(self.frame) - y*self.scale)), int(round((x + 1)*self.scale))
+
+    def stamp(self, mask, x, y, color):
+        """
+        Pinta una máscara centrada en el punto dado, recortada a los bordes.
+        """
+        H, W = self.frame.shape
+        r = len(mask)//2
+        row, col = self.pixel(x, y)
+        top, left = max(row - r, 0), max(col - r, 0)
+        bottom, right = min(row + r + 1, H), min(col + r + 1, W)
+        if top >= bottom or left >= right:
+            return
+        m = mask[top - row + r:bottom - row + r, left - col + r:right - col + r]
+        self.frame[top:bottom, left:right][m] = color
+
+    def draw(self, y, alive, pipe_x, pipe_y):
+        """
+        Pinta un cuadro.
+
+        Parámetros
+        ----------
+        y : numpy.array
+            Posición vertical de cada pájaro.
+
+        alive : numpy.array
+            Arreglo booleano que indica qué pájaros siguen vivos.
+
+        pipe_x, pipe_y : numpy.array
+            Posición horizontal y altura de la apertura de cada tubería.
+
+        Salida
+        ------
+        frame : numpy.array
+            `self.frame`, con el cuadro pintado.
+        """
+        PIPE_WIDTH = self.settings['PIPE_WIDTH']
+        PIPE_GAP = self.settings['PIPE_GAP']
+        H, W = self.frame.shape
+
+        self.frame[:] = 0
+        for x, gap in zip(pipe_x, pipe_y):
+            left = min(max(self.pixel(x, 0)[1], 0), W)
+            right = min(max(self.pixel(x + PIPE_WIDTH, 0)[1], 0), W)
+            low = min(max(self.pixel(0, gap - PIPE_GAP/2)[0], 0), H)
+            high = min(max(self.pixel(0, gap + PIPE_GAP/2)[0], 0), H)
+            self.frame[low:, left:right] = 1  # Tubería de abajo
+            self.frame[:high, left:right] = 1 # Tubería de arriba
+            self.stamp(self.center, x, gap, 2)
+        for b, a, c in zip(y, alive, self.colors):
+            if a or self.draw_dead:
+                self.stamp(self.bird, 0, b, c)
+        return self.frame
+
+    def to_image(self, frame):
+        """
+        Convierte un cuadro en una imagen de `PIL` con paleta, que se codifica
+        mucho más rápido que una en RGB.
+        """
+        image = Image.fromarray(frame, 'P')
+        image.putpalette(self.palette.ravel().tolist())
+        return image
+
+class Renderer:
+    """
+    Clase que dibuja el estado de un mundo en una figura de matplotlib que se
+    reutiliza en cada cuadro.
+
+    Parámetros
+    ----------
+    settings : dict
+        Diccionario de configuración.
+
+    birds : int
+        Número de pájaros del mundo.
+
+    width : float = 10
+        Ancho de la figura, en pulgadas. El alto se escoge para que los ejes
+        tengan proporción 1:1 y ocupen toda la figura.
+
+    dpi : int = 200
+        Resolución de la figura.
+
+    draw_dead : bool = False
+        Si dibujar los pájaros muertos.
+
+    Atributos
+    ---------
+    figure : matplotlib.figure.Figure
+        Figura donde se dibuja. No pertenece a `pyplot`, así que no hay que
+        cerrarla.
+
+    colors : numpy.array
+        Color de cada pájaro. Si hay dos pájaros son azul y naranja, como en
+        `World.plot`.
+
+    Notas
+    -----
+    En lugar de crear una figura y agregar todos los objetos en cada cuadro,
+    sólo se mueven los rectángulos de las tuberías y los círculos de los
+    pájaros, que son una sola colección cada uno.
+    """
+    def __init__(self, settings, birds, width=10, dpi=200, draw_dead=False):
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        from matplotlib.collections import EllipseCollection, PolyCollection
+        RIGHT = settings['RIGHT']
+        TOP = settings['TOP']
+        BIRD_RADIUS = settings['BIRD_RADIUS']
+        self.settings = settings
+        self.draw_dead = draw_dead
+
+        self.figure = Figure(figsize=(width, width*TOP/(RIGHT + 1)), dpi=dpi)
+        self.canvas = FigureCanvasAgg(self.figure)
+        ax = self.figure.add_axes([0, 0, 1, 1])
+        ax.set_xlim(-1, RIGHT)
+        ax.set_ylim(0, TOP)
+        ax.set_aspect('equal')
+        ax.tick_params(left=False, bottom=False, labelleft=False, labelbottom=False)
+        self.ax = ax
+
+        self.colors = np.array(['b', 'orange'] if birds == 2 else ['C0']*birds, dtype=object)
+        self.pipes = ax.add_collection(PolyCollection([], facecolors='C0'))
+        self.centers = ax.scatter([], [], color='C1')
+        self.birds = ax.add_collection(EllipseCollection(2*BIRD_RADIUS, 2*BIRD_RADIUS, 0, units='xy',
+                                                         offsets=np.empty((0, 2)),
+                                                         offset_transform=ax.transData))
+
+    def draw(self, y, alive, pipe_x, pipe_y):
+        """
+        Dibuja un cuadro (véase `Rasterizer.draw`).
+
+        Salida
+        ------
+        frame : numpy.array
+            Arreglo de la forma `alto x ancho x 3` con los colores del cuadro.
+        """
+        PIPE_WIDTH = self.settings['PIPE_WIDTH']
+        PIPE_GAP = self.settings['PIPE_GAP']
+        TOP = self.settings['TOP']
+
+        # Rectángulos de abajo y de arriba de cada tubería
+        x0, x1 = pipe_x, pipe_x + PIPE_WIDTH
+        bottom = [[(a, 0), (b, 0), (b, c), (a, c)] for a, b, c in zip(x0, x1, pipe_y - PIPE_GAP/2)]
+        top = [[(a, c), (b, c), (b, TOP + c), (a, TOP + c)] for a, b, c in zip(x0, x1, pipe_y + PIPE_GAP/2)]
+        self.pipes.set_verts(bottom + top)
+        self.centers.set_offsets(np.column_stack([pipe_x, pipe_y]))
+
+        shown = np.ones(len(y), dtype=bool) if self.draw_dead else np.asarray(alive, dtype=bool)
+        self.birds.set_offsets(np.column_stack([np.zeros(np.count_nonzero(shown)), np.asarray(y)[shown]]))
+        self.birds.set_facecolors(list(self.colors[shown]))
+
+        self.canvas.draw()
+        return np.asarray(self.canvas.buffer_rgba())[..., :3]
+
+    def to_image(self, frame):
+        """
+        Convierte un cuadro en una imagen de `PIL`.
+        """
+        return Image.fromarray(frame)
+
+RENDERERS = {'raster': Rasterizer,
+             'figure': Renderer}
+
+def init_renderer(kind, settings, birds, options):
+    """
+    Inicializa un proceso de la pool de `FrameWriter` con su propio dibujador.
+    """
+    global _renderer
+    _renderer = RENDERERS[kind](settings, birds, **options)
+
+def render_frame(task):
+    """
+    Dibuja y guarda un cuadro en un proceso inicializado con `init_renderer`.
+
+    Parámetros
+    ----------
+    task : tuple
+        Tupla `(state, path)` con el estado del mundo (véase `World.state`) y
+        la ubicación de la imagen.
+    """
+    state, path = task
+    _renderer.to_image(_renderer.draw(*state)).save(path, compress_level=1)
+
+class FrameWriter:
+    """
+    Clase que dibuja y escribe los cuadros de un mundo conforme se producen.
+
+    Parámetros
+    ----------
+    path : str
+        Destino de los cuadros.
+            - Si termina en `.gif`, se escribe una sola animación con `PIL`.
+            - Si termina en otra extensión de video (por ejemplo `.mp4`), se
+              escribe una sola animación con `ffmpeg`.
+            - En otro caso es un directorio donde se guarda un archivo PNG por
+              cuadro, con nombres `00000.png`, `00001.png`, ...
+
+    settings : dict
+        Diccionario de configuración.
+
+    birds : int
+        Número de pájaros del mundo.
+
+    processes : int = 1
+        Número de procesos que dibujan y codifican las imágenes PNG en
+        paralelo. Sólo se usa con una secuencia de imágenes; `ffmpeg` ya usa
+        varios hilos.
+
+    fps : int = 30
+        Cuadros por segundo de la animación.
+
+    kind : str = 'raster'
+        Forma de dibujar los cuadros (véase `RENDERERS`).
+
+    **options
+        Parámetros adicionales del dibujador, por ejemplo `width` o `dpi`.
+
+    Notas
+    -----
+    Con varios procesos cada uno tiene su propio dibujador y sólo recibe el
+    estado del mundo, que es mucho más pequeño que el cuadro. Se mantienen a lo
+    más `2*processes` cuadros en espera, para no guardar toda la animación en
+    memoria. Por lo mismo, cada cuadro de un GIF se codifica y se escribe al
+    archivo en cuanto se dibuja, con su propia paleta.
+    """
+    VIDEO = ('.mp4', '.avi', '.mov', '.mkv', '.webm')
+
+    def __init__(self, path, settings, birds, processes=1, fps=30, kind='raster', **options):
+        self.path = path
+        self.processes = processes
+        self.fps = fps
+        self.count = 0
+        self.pool = None
+        self.renderer = None
+        self.pending = []
+        self.gif = None
+        self.palette = None
+        self.previous = None
+        self.ffmpeg = None
+        extension = os.path.splitext(path)[1].lower()
+        if extension == '.gif':
+            self.mode = 'gif'
+        elif extension in self.VIDEO:
+            self.mode = 'video'
+        else:
+            self.mode = 'images'
+            os.makedirs(path, exist_ok=True)
+        if self.mode == 'images' and processes > 1:
+            self.pool = mp.Pool(processes, initializer=init_renderer, initargs=(kind, settings, birds, options))
+        else:
+            self.renderer = RENDERERS[kind](settings, birds, **options)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def write(self, state):
+        """
+        Dibuja y escribe un cuadro.
+
+        Parámetros
+        ----------
+        state : tuple
+            Estado del mundo (véase `World.state`).
+        """
+        if self.mode == 'images':
+            path = os.path.join(self.path, str(self.count).rjust(5, '0') + ".png")
+            if self.pool is None:
+                self.renderer.to_image(self.renderer.draw(*state)).save(path, compress_level=1)
+            else: # Copiamos el estado, pues el mundo lo sigue modificando
+                task = ([np.array(s) for s in state], path)
+                self.pending.append(self.pool.apply_async(render_frame, (task,)))
+                while len(self.pending) > 2*self.processes: # Esperamos al más viejo
+                    self.pending.pop(0).get()
+        else:
+            image = self.renderer.to_image(self.renderer.draw(*state))
+            if self.mode == 'gif':
+                self.write_gif(image if image.mode == 'P' else image.quantize())
+            elif self.mode == 'video':
+                frame = np.asarray(image.convert('RGB'))
+                if self.ffmpeg is None:
+                    self.ffmpeg = self.open_ffmpeg(frame.shape)
+                self.ffmpeg.stdin.write(frame.tobytes())
+        self.count += 1
+
+    def write_gif(self, image):
+        """
+        Agrega una imagen con paleta al GIF, abriendo el archivo y escribiendo
+        su encabezado con la primera. Sólo los cuadros con una paleta distinta
+        a la de la primera imagen llevan la suya; los demás sólo guardan el
+        rectángulo que cambió respecto al cuadro anterior, como `Image.save`.
+        """
+        duration = int(1000/self.fps)
+        if self.gif is None:
+            self.gif = open(self.path, 'wb')
+            header, _ = GifImagePlugin.getheader(image, info={'loop': 0, 'duration': duration})
+            self.gif.write(b''.join(header))
+            self.palette = image.getpalette()
+        local = image.getpalette() != self.palette
+        pixels = np.array(image)
+        offset = (0, 0)
+        if not local and self.previous is not None:
+            changed = pixels != self.previous
+            rows, cols = np.flatnonzero(changed.any(axis=1)), np.flatnonzero(changed.any(axis=0))
+            if len(rows) == 0: # Cuadro repetido: basta un pixel
+                rows = cols = np.zeros(1, dtype=int)
+            offset = (int(cols[0]), int(rows[0]))
+            image = image.crop((cols[0], rows[0], cols[-1] + 1, rows[-1] + 1))
+        self.previous = pixels
+        for chunk in GifImagePlugin.getdata(image, offset, duration=duration, include_color_table=local):
+            self.gif.write(chunk)
+
+    def open_ffmpeg(self, shape):
+        """
+        Inicia un proceso de `ffmpeg` que recibe cuadros crudos en RGB por su
+        entrada estándar. El ejecutable se toma de la variable de entorno
+        `FFMPEG`, o de `ffmpeg` en el `PATH`.
+        """
+        ffmpeg = os.environ.get('FFMPEG', 'ffmpeg')
+        if shutil.which(ffmpeg) is None:
+            raise RuntimeError("No se encontró {}; use un directorio o un archivo .gif".format(ffmpeg))
+        height, width = shape[:2]
+        command = [ffmpeg, '-y', '-loglevel', 'error',
+                   '-f', 'rawvideo', '-pix_fmt', 'rgb24', '-s', '{}x{}'.format(width, height),
+                   '-r', str(self.fps), '-i', '-',
+                   '-vf', 'pad=ceil(iw/2)*2:ceil(ih/2)*2', '-pix_fmt', 'yuv420p', self.path]
+        return subprocess.Popen(command, stdin=subprocess.PIPE)
+
+    def close(self):
+        """
+        Termina de escribir todos los cuadros pendientes.
+        """
+        if self.pool is not None:
+            for p in self.pending:
+                p.get()
+            self.pending = []
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
+        if self.gif is not None:
+            self.gif.write(b';') # Fin del archivo GIF
+            self.gif.close()
+            self.gif = self.previous = None
+        if self.ffmpeg is not None:
+            self.ffmpeg.stdin.close()
+            self.ffmpeg.wait()
+            self.ffmpeg = None
@@ -0,0 +1,25 @@
+"""
+Pruebas de que entrenar con `settings['DTYPE'] = 'float32'` da las mismas
+curvas de fitness que con 64 bits (véase `benchmark.equivalence_test`).
+
+    python -m pytest test_dtype.py
+"""
+
+import numpy as np
+
+import benchmark
+
+def test_equivalence_test_detects_differences():
+    rng = np.random.default_rng(0)
+    b = rng.normal(10, 2, size=(20, 6))
+    assert benchmark.equivalence_test(b + rng.normal(0, 0.1, size=b.shape), b)['equivalent']
+    assert not benchmark.equivalence_test(b + 2 + rng.normal(0, 0.5, size=b.shape), b)['equivalent']
+    assert not benchmark.equivalence_test(b[:3] + rng.normal(0, 5, size=(3, 6)), b[:3])['equivalent']
+
+def test_float32_training_curves():
+    seeds, birds, generations = 20, 20, 6
+    curves = {dtype: benchmark.train_curves(benchmark.settings_with(DTYPE=dtype, MAX_STEPS=300),
+                                            seeds, birds, generations)
+              for dtype in ['float64', 'float32']}
+    test = benchmark.equivalence_test(curves['float32'], curves['float64'])
+    assert test['equivalent'], test
@@ -0,0 +1,182 @@
+"""
+Este archivo implementa la grabación compacta de la trayectoria de un mundo,
+para poder guardarla y volver a dibujarla sin simular otra vez las redes.
+"""
+
+import json
+
+import numpy as np
+
+class Trajectory:
+    """
+    Clase que guarda, paso por paso, la posición de los pájaros y de las
+    tuberías de un mundo en arreglos reservados desde el inicio.
+
+    Parámetros
+    ----------
+    settings : dict
+        Diccionario de configuración. Sólo se guardan los parámetros
+        numéricos, que son los necesarios para dibujar.
+
+    birds : int
+        Número de pájaros del mundo.
+
+    pipes : int
+        Número de tuberías del mundo.
+
+    steps : int = None
+        Número de pasos para los que se reserva espacio, incluyendo el estado
+        inicial. Por omisión es `settings['MAX_STEPS'] + 2`, el máximo que
+        puede durar un mundo.
+
+    dtype : numpy.dtype = numpy.float32
+        Tipo de dato de las posiciones.
+
+    Atributos
+    ---------
+    y : numpy.array
+        Arreglo de la forma `pasos x birds` con la posición vertical de cada
+        pájaro en cada paso.
+
+    death : numpy.array
+        Paso en el que murió cada pájaro. Es `len(self.y)` si sigue vivo. En
+        lugar de guardar si cada pájaro está vivo en cada paso, basta con
+        compararlo contra el paso.
+
+    pipe_x, pipe_y : numpy.array
+        Arreglos de la forma `pasos x pipes` con la posición horizontal y la
+        altura de la apertura de cada tubería en cada paso.
+
+    length : int
+        Número de pasos grabados.
+
+    Notas
+    -----
+    Un mundo graba su trayectoria si se crea con `record=True`. Por ejemplo,
+    para ver al mejor pájaro de una población en el recorrido en el que se
+    evaluó:
+
+        world = World(nets, settings, seed=trainer.course, record=True)
+        world.play()
+        world.trajectory.save('poblacion.npz')
+        ...
+        t = Trajectory.load('poblacion.npz')
+        t.select([t.best()]).render('mejor.gif')
+    """
+    def __init__(self, settings, birds, pipes, steps=None, dtype=np.float32):
+        if steps is None:
+            steps = settings['MAX_STEPS'] + 2
+        self.settings = {k: v for k, v in settings.items() if isinstance(v, (int, float))}
+        self.y = np.zeros((steps, birds), dtype=dtype)
+        self.death = np.full(birds, steps, dtype=np.int32)
+        self.pipe_x = np.zeros((steps, pipes), dtype=dtype)
+        self.pipe_y = np.zeros((steps, pipes), dtype=dtype)
+        self.fitness = np.zeros(birds)
+        self.length = 0
+
+    def record(self, y, alive, pipe_x, pipe_y):
+        """
+        Graba un paso, con el estado que regresa `World.state`.
+        """
+        t = self.length
+        self.y[t] = y
+        self.death[(~np.asarray(alive, dtype=bool)) & (self.death > t)] = t
+        self.pipe_x[t] = pipe_x
+        self.pipe_y[t] = pipe_y
+        self.length += 1
+
+    def state(self, t):
+        """
+        Estado del mundo en el paso `t`, en la misma forma que `World.state`.
+        """
+        return self.y[t], t < self.death, self.pipe_x[t], self.pipe_y[t]
+
+    def __len__(self):
+        return self.length
+
+    def best(self):
+        """
+        Índice del pájaro con mayor fitness.
+        """
+        return int(np.argmax(self.fitness))
+
+    def select(self, birds):
+        """
+        Regresa la trayectoria de sólo algunos pájaros.
+
+        Parámetros
+        ----------
+        birds : list
+            Índices de los pájaros a conservar.
+
+        Salida
+        ------
+        trajectory : Trajectory
+            Trayectoria nueva con los pájaros dados y las mismas tuberías.
+            Sólo dura hasta que mueren todos los pájaros seleccionados.
+        """
+        birds = np.asarray(birds)
+        out = Trajectory.__new__(Trajectory)
+        out.settings = dict(self.settings)
+        out.death = self.death[birds].copy()
+        out.length = min(self.length, int(out.death.max(initial=0)) + 1)
+        out.y = self.y[:out.length, birds].copy()
+        out.pipe_x = self.pipe_x[:out.length].copy()
+        out.pipe_y = self.pipe_y[:out.length].copy()
+        out.fitness = self.fitness[birds].copy()
+        return out
+
+    def save(self, path):
+        """
+        Guarda la trayectoria en un archivo `.npz` comprimido. Sólo se guardan
+        los pasos grabados.
+        """
+        np.savez_compressed(path,
+                            y=self.y[:self.length],
+                            death=np.minimum(self.death, self.length),
+                            pipe_x=self.pipe_x[:self.length],
+                            pipe_y=self.pipe_y[:self.length],
+                            fitness=self.fitness,
+                            settings=json.dumps(self.settings))
+
+    @classmethod
+    def load(cls, path):
+        """
+        Lee una trayectoria guardada con `save`.
+        """
+        with np.load(path) as data:
+            out = cls.__new__(cls)
+            out.settings = json.loads(str(data['settings']))
+            out.y = data['y']
+            out.death = data['death']
+            out.pipe_x = data['pipe_x']
+            out.pipe_y = data['pipe_y']
+            out.fitness = data['fitness']
+            out.length = len(out.y)
+        return out
+
+    def render(self, path, processes=1, fps=30, kind='raster', **options):
+        """
+        Dibuja todos los pasos grabados, sin simular (véase `render.FrameWriter`).
+
+        Parámetros
+        ----------
+        path : str
+            Directorio donde guardar los cuadros, o archivo `.gif` o de video.
+
+        processes : int = 1
+            Número de procesos que dibujan y codifican los PNG en paralelo.
+
+        fps : int = 30
+            Cuadros por segundo de la animación.
+
+        kind : str = 'raster'
+            Forma de dibujar los cuadros (véase `render.RENDERERS`).
+
+        **options
+            Parámetros adicionales del dibujador, por ejemplo `width`.
+        """
+        import render
+        with render.FrameWriter(path, self.settings, self.y.shape[1], processes, fps, kind, **options) as writer:
+            for t in range(self.length):
+                writer.write(self.state(t))